@@ -0,0 +1,207 @@
+"""
+Device ACL cache
+Per-device MQTT topic permissions compiled once and kept in an in-process
+LRU and Redis, so EMQX authorization requests don't query Postgres
+"""
+
+import logging
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from apps.devices.models import TopicRule
+from apps.main import json_codec
+from apps.main.async_redis import get_async_redis
+from apps.main.local_cache import LocalTTLCache
+
+logger = logging.getLogger(__name__)
+
+# Same defaults as compose/emqx/acl.conf, applied after custom rules
+DEFAULT_RULES = [
+    ("subscribe", True, "to_device/${username}"),
+    ("publish", True, "from_device/${username}/status"),
+    ("publish", True, "from_device/${username}/event"),
+]
+
+
+# Characters that change the meaning of a substituted ${username}
+UNSAFE_USERNAME_CHARS = "+#/"
+
+
+class CompiledRule(NamedTuple):
+    action: str
+    allow: bool
+    levels: tuple[str, ...]
+
+
+def acl_key(username: str) -> str:
+    return f"devices:acl:{username}"
+
+
+# Compiled rule lists by username
+local_cache = LocalTTLCache(
+    max_size=settings.DEVICE_ACL_LOCAL_CACHE_SIZE,
+    ttl=settings.DEVICE_ACL_LOCAL_CACHE_TTL,
+)
+
+
+def compile_rules(rules: list, username: str) -> list[CompiledRule]:
+    """
+    Substitute placeholders and split topic filters into levels
+
+    Rules with ${username} are skipped for usernames containing MQTT
+    wildcards or level separators (devices created before validation), so
+    such a username can't widen its own grants.
+
+    Args:
+        rules: (action, allow, topic_filter) rows
+        username: Device username
+
+    Returns:
+        Compiled rules in evaluation order
+    """
+    unsafe = any(char in username for char in UNSAFE_USERNAME_CHARS)
+    if unsafe:
+        logger.warning(f"Skipping ${{username}} ACL rules of device {username!r}")
+    return [
+        CompiledRule(
+            action,
+            allow,
+            tuple(topic_filter.replace("${username}", username).split("/")),
+        )
+        for action, allow, topic_filter in rules
+        if not (unsafe and "${username}" in topic_filter)
+    ]
+
+
+def filter_covers(rule: tuple[str, ...], topic: list[str]) -> bool:
+    """
+    Check if rule filter covers topic (or subscription filter)
+
+    Args:
+        rule: Rule filter levels
+        topic: Topic levels, may contain wildcards for subscribe requests
+
+    Returns:
+        bool: True if every topic matched by topic is matched by rule
+    """
+    for i, level in enumerate(rule):
+        if level == "#":
+            # Wildcards at the first level don't match "$SYS/..." topics
+            return not (i == 0 and topic and topic[0].startswith("$"))
+        if i >= len(topic):
+            return False
+        if level == "+":
+            if topic[i] == "#" or (i == 0 and topic[i].startswith("$")):
+                return False
+        elif level != topic[i]:
+            return False
+    return len(rule) == len(topic)
+
+
+def is_allowed(rules: list[CompiledRule], action: str, topic: str) -> bool:
+    """
+    Evaluate compiled rules, first matching rule wins, deny by default
+
+    Args:
+        rules: Compiled rules
+        action: "publish" or "subscribe"
+        topic: Topic or subscription filter
+
+    Returns:
+        bool: True if allowed
+    """
+    levels = topic.split("/")
+    for rule in rules:
+        if rule.action in (action, TopicRule.Action.ALL) and filter_covers(
+            rule.levels, levels
+        ):
+            return rule.allow
+    return False
+
+
+async def load_rules(username: str) -> list:
+    """
+    Load device and group rules from DB followed by default rules
+
+    Args:
+        username: Device username
+
+    Returns:
+        (action, allow, topic_filter) rows
+    """
+    rules = [
+        row
+        async for row in TopicRule.objects.filter(
+            Q(device__username=username) | Q(group__devices__username=username)
+        )
+        .order_by("priority", "id")
+        .values_list("action", "allow", "topic_filter")
+    ]
+    return rules + [list(rule) for rule in DEFAULT_RULES]
+
+
+async def get_rules(username: str) -> list[CompiledRule]:
+    """
+    Get compiled rules of device from local cache, Redis or DB
+
+    Args:
+        username: Device username
+
+    Returns:
+        Compiled rules
+    """
+    rules = local_cache.get(username)
+    if rules is not None:
+        return rules
+
+    redis = get_async_redis()
+    key = acl_key(username)
+    value = await redis.get(key)
+    if value is not None:
+        raw_rules = json_codec.loads(value)
+    else:
+        raw_rules = await load_rules(username)
+        await redis.set(
+            key, json_codec.dumps(raw_rules), ex=settings.DEVICE_ACL_REDIS_TTL
+        )
+
+    rules = compile_rules(raw_rules, username)
+    local_cache.set(username, rules)
+    return rules
+
+
+async def authorize_device(username: str, action: str, topic: str) -> bool:
+    """
+    Check if device may publish/subscribe to topic
+
+    Args:
+        username: Device username
+        action: "publish" or "subscribe"
+        topic: Topic or subscription filter
+
+    Returns:
+        bool: True if allowed
+    """
+    if not username or not topic or action not in ("publish", "subscribe"):
+        return False
+    return is_allowed(await get_rules(username), action, topic)
+
+
+def invalidate_rules(usernames: list[str]):
+    """
+    Drop cached rules of devices (sync, called from model signals)
+
+    Args:
+        usernames: Device usernames
+    """
+    if not usernames:
+        return
+    for username in usernames:
+        local_cache.delete(username)
+    try:
+        cache.client.get_client().delete(*(acl_key(u) for u in usernames))
+    except Exception as e:
+        logger.error(f"Failed to invalidate ACL of {len(usernames)} devices: {e}")
@@ -1,7 +1,15 @@
 from django import forms
 from django.contrib import admin
 
-from apps.devices.models import Device
+from apps.devices.models import (
+    Device,
+    DeviceEvent,
+    DeviceGroup,
+    DeviceHourRollup,
+    DeviceMinuteRollup,
+    DeviceStatus,
+    TopicRule,
+)
 
 
 class DeviceForm(forms.ModelForm):
@@ -9,7 +17,7 @@ class DeviceForm(forms.ModelForm):
 
     class Meta:
         model = Device
-        fields = ["name", "username", "password", "password_hash", "salt"]
+        fields = ["name", "username", "password", "groups", "password_hash", "salt"]
         readonly_fields = ["password_hash", "salt"]
 
     def save(self, commit=True):
@@ -22,9 +30,42 @@ class DeviceForm(forms.ModelForm):
         return device
 
 
+class TopicRuleInline(admin.TabularInline):
+    model = TopicRule
+    extra = 0
+    fields = ("priority", "allow", "action", "topic_filter")
+
+
 @admin.register(Device)
 class DeviceAdmin(admin.ModelAdmin):
     list_display = ("name", "username")
     search_fields = ("name", "username")
     readonly_fields = ("password_hash", "salt")
+    filter_horizontal = ("groups",)
+    inlines = [TopicRuleInline]
     form = DeviceForm
+
+
+@admin.register(DeviceGroup)
+class DeviceGroupAdmin(admin.ModelAdmin):
+    list_display = ("name",)
+    search_fields = ("name",)
+    inlines = [TopicRuleInline]
+
+
+@admin.register(DeviceStatus, DeviceEvent)
+class DeviceMessageAdmin(admin.ModelAdmin):
+    list_display = ("device", "received_at")
+    list_filter = ("received_at",)
+    search_fields = ("device__username",)
+    list_select_related = ("device",)
+    raw_id_fields = ("device",)
+
+
+@admin.register(DeviceMinuteRollup, DeviceHourRollup)
+class DeviceRollupAdmin(admin.ModelAdmin):
+    list_display = ("device", "bucket", "status_count", "event_count")
+    list_filter = ("bucket",)
+    search_fields = ("device__username",)
+    list_select_related = ("device",)
+    raw_id_fields = ("device",)
@@ -0,0 +1,121 @@
+"""
+Device credential cache
+Verifies MQTT device credentials from an in-process LRU and Redis, so
+reconnect storms don't query Postgres on every CONNECT
+"""
+
+import hashlib
+import hmac
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.devices.models import Device
+from apps.main.async_redis import get_async_redis
+from apps.main.local_cache import LocalTTLCache
+
+logger = logging.getLogger(__name__)
+
+# Stored for usernames without a device, so unknown clients are cached too
+MISSING = ""
+
+
+def credentials_key(username: str) -> str:
+    return f"devices:credentials:{username}"
+
+
+# "password_hash:salt" entries by username
+local_cache = LocalTTLCache(
+    max_size=settings.DEVICE_AUTH_LOCAL_CACHE_SIZE,
+    ttl=settings.DEVICE_AUTH_LOCAL_CACHE_TTL,
+)
+
+
+def encode_credentials(password_hash: str, salt: str) -> str:
+    return f"{password_hash}:{salt}"
+
+
+def check_credentials(entry: str, password: str) -> bool:
+    """
+    Check password against cached entry (same scheme as Device.check_password)
+
+    Args:
+        entry: Cached "password_hash:salt" or MISSING
+        password: Raw password from CONNECT
+
+    Returns:
+        bool: True if password matches
+    """
+    if entry == MISSING:
+        return False
+    password_hash, _, salt = entry.partition(":")
+    digest = hashlib.sha256((password + salt).encode()).hexdigest()
+    return hmac.compare_digest(password_hash, digest)
+
+
+async def get_credentials(username: str) -> str:
+    """
+    Get cached credentials entry, loading it from DB on miss
+
+    Args:
+        username: Device username
+
+    Returns:
+        "password_hash:salt" or MISSING
+    """
+    entry = local_cache.get(username)
+    if entry is not None:
+        return entry
+
+    redis = get_async_redis()
+    key = credentials_key(username)
+    value = await redis.get(key)
+    if value is not None:
+        entry = value.decode()
+    else:
+        device = (
+            await Device.objects.filter(username=username)
+            .values_list("password_hash", "salt")
+            .afirst()
+        )
+        if device is None:
+            entry = MISSING
+            timeout = settings.DEVICE_AUTH_MISSING_TTL
+        else:
+            entry = encode_credentials(*device)
+            timeout = settings.DEVICE_AUTH_REDIS_TTL
+        await redis.set(key, entry, ex=timeout)
+
+    local_cache.set(username, entry)
+    return entry
+
+
+async def authenticate_device(username: str, password: str) -> bool:
+    """
+    Verify device credentials
+
+    Args:
+        username: Device username
+        password: Raw password
+
+    Returns:
+        bool: True if device exists and password matches
+    """
+    if not username or password is None:
+        return False
+    return check_credentials(await get_credentials(username), password)
+
+
+def invalidate_device(username: str):
+    """
+    Drop cached credentials of device (sync, called from model signals)
+
+    Args:
+        username: Device username
+    """
+    local_cache.delete(username)
+    try:
+        cache.client.get_client().delete(credentials_key(username))
+    except Exception as e:
+        logger.error(f"Failed to invalidate credentials of {username}: {e}")
@@ -0,0 +1,205 @@
+"""
+Device telemetry ingestion
+Buffers device status/event messages and writes them with bulk_create
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from apps.devices.models import Device, DeviceEvent, DeviceStatus
+from apps.main.local_cache import LocalTTLCache
+
+logger = logging.getLogger(__name__)
+
+# (device username, payload, received at)
+BufferedMessage = tuple[str, Any, datetime]
+
+
+class TelemetryIngestor:
+    """
+    Batches device messages in memory and flushes them to Postgres when the
+    batch size or the flush interval is reached
+
+    DB work runs in a worker thread, so the MQTT event loop keeps reading
+    while rows are written.
+    """
+
+    MODELS = {"status": DeviceStatus, "event": DeviceEvent}
+
+    # Writes of a batch before it is dropped
+    FLUSH_ATTEMPTS = 2
+
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+    ):
+        """
+        Initialize ingestor
+
+        Args:
+            batch_size: Buffered messages that trigger a flush
+            flush_interval: Max seconds a message waits in the buffer
+        """
+        self.batch_size = batch_size or settings.DEVICE_INGEST_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.DEVICE_INGEST_FLUSH_INTERVAL
+        self._buffers: dict[str, list[BufferedMessage]] = {
+            kind: [] for kind in self.MODELS
+        }
+        self._size = 0
+        self._device_ids = LocalTTLCache(
+            max_size=settings.DEVICE_ID_CACHE_SIZE,
+            ttl=settings.DEVICE_ID_CACHE_TTL,
+        )
+        self._flush_lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start periodic flush task"""
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self):
+        """Stop periodic flush task and write remaining messages"""
+        if self._timer is not None:
+            self._timer.cancel()
+            await asyncio.gather(self._timer, return_exceptions=True)
+            self._timer = None
+        await self.flush()
+
+    async def add(self, kind: str, username: str, data: Any):
+        """
+        Buffer device message, flushing when batch is full
+
+        Args:
+            kind: Message kind ("status" or "event")
+            username: Device username from topic
+            data: Decoded payload
+        """
+        self._buffers[kind].append((username, data, timezone.now()))
+        self._size += 1
+        if self._size >= self.batch_size:
+            # Callers wait here while a full batch is written, which slows
+            # down reading instead of growing the buffer without limit
+            await self.flush()
+
+    async def flush(self):
+        """Write buffered messages to database"""
+        async with self._flush_lock:
+            if not self._size:
+                return
+
+            buffers = self._buffers
+            self._buffers = {kind: [] for kind in self.MODELS}
+            self._size = 0
+
+            count = sum(map(len, buffers.values()))
+            for attempt in range(1, self.FLUSH_ATTEMPTS + 1):
+                try:
+                    written = await sync_to_async(self.write)(buffers)
+                    logger.debug(f"Ingested {written} device messages")
+                    return
+                except Exception as e:
+                    # Cached ids may point to deleted devices, resolve them again
+                    self._device_ids.clear()
+                    if attempt < self.FLUSH_ATTEMPTS:
+                        logger.warning(
+                            f"Failed to ingest {count} device messages, "
+                            f"retrying: {e}"
+                        )
+                        continue
+                    logger.error(
+                        f"Failed to ingest {count} device messages, "
+                        f"dropping them: {e}",
+                        exc_info=True,
+                    )
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def resolve_devices(self, usernames: set[str]) -> dict[str, int]:
+        """
+        Map device usernames to ids, querying only ones not cached
+
+        Args:
+            usernames: Device usernames
+
+        Returns:
+            Known username -> device id mapping
+        """
+        result = {}
+        missing = set()
+        for username in usernames:
+            device_id = self._device_ids.get(username)
+            if device_id is None:
+                missing.add(username)
+            elif device_id:
+                result[username] = device_id
+        if missing:
+            found = dict(
+                Device.objects.filter(username__in=missing).values_list(
+                    "username", "id"
+                )
+            )
+            for username in missing:
+                # 0 marks unknown usernames, kept briefly so they aren't
+                # queried on every flush
+                if username in found:
+                    self._device_ids.set(username, found[username])
+                else:
+                    self._device_ids.set(
+                        username, 0, ttl=settings.DEVICE_ID_MISSING_TTL
+                    )
+            result.update(found)
+        return result
+
+    def write(self, buffers: dict[str, list[BufferedMessage]]) -> int:
+        """
+        Bulk insert buffered messages in one transaction (sync, runs in
+        worker thread), so a failed write can be retried without duplicates
+
+        Args:
+            buffers: Buffered messages by kind
+
+        Returns:
+            int: Number of rows written
+        """
+        close_old_connections()
+
+        usernames = {m[0] for messages in buffers.values() for m in messages}
+        device_ids = self.resolve_devices(usernames)
+        unknown = usernames - device_ids.keys()
+        if unknown:
+            logger.warning(f"Skipping messages of unknown devices: {sorted(unknown)}")
+
+        written = 0
+        with transaction.atomic():
+            for kind, messages in buffers.items():
+                rows = [
+                    self.MODELS[kind](
+                        device_id=device_ids[username],
+                        data=data,
+                        received_at=received_at,
+                    )
+                    for username, data, received_at in messages
+                    if username in device_ids
+                ]
+                if rows:
+                    self.MODELS[kind].objects.bulk_create(
+                        rows, batch_size=self.batch_size
+                    )
+                    written += len(rows)
+        return written
+
+
+# Singleton instance
+telemetry_ingestor = TelemetryIngestor()
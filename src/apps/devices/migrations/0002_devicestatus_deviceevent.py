@@ -0,0 +1,43 @@
+# Generated by Django 5.2.9 on 2026-10-17 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.JSONField(default=dict)),
+                ('received_at', models.DateTimeField(db_index=True)),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='devices.device')),
+            ],
+            options={
+                'ordering': ['-received_at'],
+                'abstract': False,
+                'indexes': [models.Index(fields=['device', '-received_at'], name='devices_event_device_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DeviceStatus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.JSONField(default=dict)),
+                ('received_at', models.DateTimeField(db_index=True)),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='devices.device')),
+            ],
+            options={
+                'verbose_name_plural': 'device statuses',
+                'ordering': ['-received_at'],
+                'abstract': False,
+                'indexes': [models.Index(fields=['device', '-received_at'], name='devices_status_device_idx')],
+            },
+        ),
+    ]
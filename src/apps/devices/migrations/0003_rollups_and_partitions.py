@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta, timezone
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def swap_table_sql(table, indexes, partitioned):
+    """
+    Rebuild telemetry table as (un)partitioned copy, keeping rows and names
+
+    Partitioned tables need the partition key in the primary key, so the
+    primary key becomes (id, received_at). Django still treats id as pk.
+    """
+    new = f"{table}_new"
+    if partitioned:
+        primary_key = "PRIMARY KEY (id, received_at)"
+        suffix = "PARTITION BY RANGE (received_at)"
+    else:
+        primary_key = "PRIMARY KEY (id)"
+        suffix = ""
+
+    sql = [
+        f"""
+        CREATE TABLE {new} (
+            id bigint GENERATED BY DEFAULT AS IDENTITY,
+            data jsonb NOT NULL,
+            received_at timestamp with time zone NOT NULL,
+            device_id bigint NOT NULL,
+            CONSTRAINT {new}_pkey {primary_key}
+        ) {suffix}
+        """,
+    ]
+    if partitioned:
+        # Daily partitions must exist before the copy: Postgres refuses to
+        # attach a range that the default partition already holds rows for
+        sql += daily_partitions_sql(table, new)
+        # Catches rows outside of partitions prepared by maintenance task
+        sql.append(f"CREATE TABLE {table}_default PARTITION OF {new} DEFAULT")
+    sql += [
+        f"""
+        INSERT INTO {new} (id, data, received_at, device_id) OVERRIDING SYSTEM VALUE
+        SELECT id, data, received_at, device_id FROM {table}
+        """,
+        f"DROP TABLE {table} CASCADE",
+        f"ALTER TABLE {new} RENAME TO {table}",
+        f"ALTER TABLE {table} RENAME CONSTRAINT {new}_pkey TO {table}_pkey",
+        f"ALTER SEQUENCE {new}_id_seq RENAME TO {table}_id_seq",
+        f"""
+        SELECT setval(
+            pg_get_serial_sequence('{table}', 'id'),
+            COALESCE((SELECT MAX(id) FROM {table}), 0) + 1,
+            false
+        )
+        """,
+        f"""
+        ALTER TABLE {table} ADD CONSTRAINT {table}_device_id_fk_devices_device_id
+        FOREIGN KEY (device_id) REFERENCES devices_device (id)
+        DEFERRABLE INITIALLY DEFERRED
+        """,
+    ]
+    sql += [f"CREATE INDEX {name} ON {table} ({columns})" for name, columns in indexes]
+    return sql
+
+
+def daily_partitions_sql(table, parent):
+    """Prepare daily partitions until the maintenance task takes over"""
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    sql = []
+    for offset in range(settings.DEVICE_TELEMETRY_PARTITIONS_AHEAD + 1):
+        start = today + timedelta(days=offset)
+        end = start + timedelta(days=1)
+        sql.append(
+            f"CREATE TABLE {table}_p{start:%Y%m%d} "
+            f"PARTITION OF {parent} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+    return sql
+
+
+STATUS_INDEXES = [
+    ("devices_devicestatus_received_at_d4fa1a30", "received_at"),
+    ("devices_status_device_idx", "device_id, received_at DESC"),
+]
+EVENT_INDEXES = [
+    ("devices_deviceevent_received_at_fb0e1ae9", "received_at"),
+    ("devices_event_device_idx", "device_id, received_at DESC"),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0002_devicestatus_deviceevent'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            swap_table_sql("devices_devicestatus", STATUS_INDEXES, partitioned=True),
+            swap_table_sql("devices_devicestatus", STATUS_INDEXES, partitioned=False),
+        ),
+        migrations.RunSQL(
+            swap_table_sql("devices_deviceevent", EVENT_INDEXES, partitioned=True),
+            swap_table_sql("devices_deviceevent", EVENT_INDEXES, partitioned=False),
+        ),
+        migrations.CreateModel(
+            name='DeviceHourRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(db_index=True)),
+                ('status_count', models.PositiveIntegerField(default=0)),
+                ('event_count', models.PositiveIntegerField(default=0)),
+                ('last_status', models.JSONField(blank=True, null=True)),
+                ('last_received_at', models.DateTimeField()),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='devices.device')),
+            ],
+            options={
+                'ordering': ['-bucket'],
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('device', 'bucket'), name='devices_hour_rollup_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DeviceMinuteRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(db_index=True)),
+                ('status_count', models.PositiveIntegerField(default=0)),
+                ('event_count', models.PositiveIntegerField(default=0)),
+                ('last_status', models.JSONField(blank=True, null=True)),
+                ('last_received_at', models.DateTimeField()),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='devices.device')),
+            ],
+            options={
+                'ordering': ['-bucket'],
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('device', 'bucket'), name='devices_minute_rollup_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.11 on 2026-10-17 13:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0003_rollups_and_partitions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceGroup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=150, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='groups',
+            field=models.ManyToManyField(blank=True, related_name='devices', to='devices.devicegroup'),
+        ),
+        migrations.CreateModel(
+            name='TopicRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('publish', 'Publish'), ('subscribe', 'Subscribe'), ('all', 'Publish & subscribe')], max_length=10)),
+                ('topic_filter', models.CharField(max_length=255)),
+                ('allow', models.BooleanField(default=True)),
+                ('priority', models.IntegerField(default=100)),
+                ('device', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rules', to='devices.device')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rules', to='devices.devicegroup')),
+            ],
+            options={
+                'ordering': ['priority', 'id'],
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('device__isnull', False), ('group__isnull', True)), models.Q(('device__isnull', True), ('group__isnull', False)), _connector='OR'), name='devices_topicrule_device_xor_group')],
+            },
+        ),
+    ]
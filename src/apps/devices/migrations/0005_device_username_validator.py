@@ -0,0 +1,19 @@
+# Generated by Django 5.2.11 on 2026-10-17 18:05
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0004_topic_rules'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='device',
+            name='username',
+            field=models.CharField(max_length=150, unique=True, validators=[django.core.validators.RegexValidator('^[^+#/]+\\Z', "Username can't contain '+', '#' or '/'.")]),
+        ),
+    ]
@@ -1,10 +1,19 @@
 import os
 import hashlib
+from django.core.validators import RegexValidator
 from django.db import models
 
+# Username is one topic level of ${username} ACL rules, wildcards or
+# separators in it would widen the device's own grants
+validate_device_username = RegexValidator(
+    r"^[^+#/]+\Z", "Username can't contain '+', '#' or '/'."
+)
+
 
 class BaseDevice(models.Model):
-    username = models.CharField(max_length=150, unique=True)
+    username = models.CharField(
+        max_length=150, unique=True, validators=[validate_device_username]
+    )
     password_hash = models.CharField(max_length=256)
     salt = models.CharField(max_length=64)
 
@@ -24,8 +33,128 @@ class BaseDevice(models.Model):
         abstract = True
 
 
+class DeviceGroup(models.Model):
+    name = models.CharField(max_length=150, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
 class Device(BaseDevice):
     name = models.CharField(max_length=150)
+    groups = models.ManyToManyField(DeviceGroup, blank=True, related_name="devices")
 
     def __str__(self):
         return self.name
+
+
+class TopicRule(models.Model):
+    """
+    MQTT authorization rule of a device or a device group
+
+    topic_filter may contain MQTT wildcards and the ${username} placeholder.
+    Rules are evaluated by priority (lower first), first match wins.
+    """
+
+    class Action(models.TextChoices):
+        PUBLISH = "publish", "Publish"
+        SUBSCRIBE = "subscribe", "Subscribe"
+        ALL = "all", "Publish & subscribe"
+
+    device = models.ForeignKey(
+        Device, on_delete=models.CASCADE, null=True, blank=True, related_name="rules"
+    )
+    group = models.ForeignKey(
+        DeviceGroup,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="rules",
+    )
+    action = models.CharField(max_length=10, choices=Action.choices)
+    topic_filter = models.CharField(max_length=255)
+    allow = models.BooleanField(default=True)
+    priority = models.IntegerField(default=100)
+
+    class Meta:
+        ordering = ["priority", "id"]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(device__isnull=False, group__isnull=True)
+                | models.Q(device__isnull=True, group__isnull=False),
+                name="devices_topicrule_device_xor_group",
+            )
+        ]
+
+    def __str__(self):
+        permission = "allow" if self.allow else "deny"
+        return f"{permission} {self.action} {self.topic_filter}"
+
+
+class BaseDeviceMessage(models.Model):
+    device = models.ForeignKey(Device, on_delete=models.CASCADE)
+    data = models.JSONField(default=dict)
+    received_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        abstract = True
+        ordering = ["-received_at"]
+
+
+class DeviceStatus(BaseDeviceMessage):
+    class Meta(BaseDeviceMessage.Meta):
+        verbose_name_plural = "device statuses"
+        indexes = [
+            models.Index(
+                fields=["device", "-received_at"], name="devices_status_device_idx"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.device_id} status at {self.received_at}"
+
+
+class DeviceEvent(BaseDeviceMessage):
+    class Meta(BaseDeviceMessage.Meta):
+        indexes = [
+            models.Index(
+                fields=["device", "-received_at"], name="devices_event_device_idx"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.device_id} event at {self.received_at}"
+
+
+class BaseDeviceRollup(models.Model):
+    device = models.ForeignKey(Device, on_delete=models.CASCADE)
+    bucket = models.DateTimeField(db_index=True)
+    status_count = models.PositiveIntegerField(default=0)
+    event_count = models.PositiveIntegerField(default=0)
+    last_status = models.JSONField(null=True, blank=True)
+    last_received_at = models.DateTimeField()
+
+    class Meta:
+        abstract = True
+        ordering = ["-bucket"]
+
+    def __str__(self):
+        return f"{self.device_id} at {self.bucket}"
+
+
+class DeviceMinuteRollup(BaseDeviceRollup):
+    class Meta(BaseDeviceRollup.Meta):
+        constraints = [
+            models.UniqueConstraint(
+                fields=["device", "bucket"], name="devices_minute_rollup_unique"
+            )
+        ]
+
+
+class DeviceHourRollup(BaseDeviceRollup):
+    class Meta(BaseDeviceRollup.Meta):
+        constraints = [
+            models.UniqueConstraint(
+                fields=["device", "bucket"], name="devices_hour_rollup_unique"
+            )
+        ]
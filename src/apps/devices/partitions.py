@@ -0,0 +1,143 @@
+"""
+Telemetry partitions
+Daily range partitions of device status/event tables (PostgreSQL)
+"""
+
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Optional
+
+from django.db import DatabaseError, connection, transaction
+
+from apps.devices.models import DeviceEvent, DeviceStatus
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_MODELS = (DeviceStatus, DeviceEvent)
+
+
+def partition_name(table: str, day: date) -> str:
+    """
+    Name of the partition holding rows of a single day
+
+    Args:
+        table: Parent table name
+        day: Partition day (UTC)
+
+    Returns:
+        Partition table name
+    """
+    return f"{table}_p{day:%Y%m%d}"
+
+
+def day_bounds(day: date) -> tuple[datetime, datetime]:
+    """
+    UTC range [start, end) covered by a daily partition
+
+    Args:
+        day: Partition day (UTC)
+
+    Returns:
+        Start and end datetimes
+    """
+    start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+def list_partitions(table: str) -> list[str]:
+    """
+    Daily partitions attached to table (default partition excluded)
+
+    Args:
+        table: Parent table name
+
+    Returns:
+        Partition table names
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s AND child.relname LIKE %s
+            """,
+            [table, f"{table}\\_p%"],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def create_partitions(days_ahead: int, today: Optional[date] = None) -> list[str]:
+    """
+    Create daily partitions from today up to days_ahead in advance
+
+    Args:
+        days_ahead: Number of future days to prepare
+        today: Current day (UTC), defaults to now
+
+    Returns:
+        Names of created partitions
+    """
+    today = today or datetime.now(timezone.utc).date()
+    created = []
+    with connection.cursor() as cursor:
+        for model in PARTITIONED_MODELS:
+            table = model._meta.db_table
+            existing = set(list_partitions(table))
+            for offset in range(days_ahead + 1):
+                day = today + timedelta(days=offset)
+                name = partition_name(table, day)
+                if name in existing:
+                    continue
+                start, end = day_bounds(day)
+                try:
+                    with transaction.atomic():
+                        cursor.execute(
+                            f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF '
+                            f'"{table}" FOR VALUES FROM (%s) TO (%s)',
+                            [start, end],
+                        )
+                except DatabaseError as e:
+                    # Default partition already holds rows of this day (task
+                    # didn't run in time), they stay there until retention
+                    logger.error(f"Failed to create partition {name}: {e}")
+                    continue
+                created.append(name)
+    if created:
+        logger.info(f"Created telemetry partitions: {created}")
+    return created
+
+
+def drop_partitions(retention_days: int, today: Optional[date] = None) -> list[str]:
+    """
+    Drop daily partitions (and default partition rows) older than retention
+
+    Args:
+        retention_days: Days of raw telemetry to keep
+        today: Current day (UTC), defaults to now
+
+    Returns:
+        Names of dropped partitions
+    """
+    today = today or datetime.now(timezone.utc).date()
+    cutoff = today - timedelta(days=retention_days)
+    cutoff_name_suffix = f"_p{cutoff:%Y%m%d}"
+    dropped = []
+    with connection.cursor() as cursor:
+        for model in PARTITIONED_MODELS:
+            table = model._meta.db_table
+            for name in list_partitions(table):
+                # Names sort by date, so string compare selects older days
+                if name[len(table) :] < cutoff_name_suffix:
+                    cursor.execute(f'DROP TABLE IF EXISTS "{name}"')
+                    dropped.append(name)
+
+            # Rows that landed outside of prepared partitions
+            cursor.execute(
+                f'DELETE FROM "{table}_default" WHERE received_at < %s',
+                [day_bounds(cutoff)[0]],
+            )
+    if dropped:
+        logger.info(f"Dropped telemetry partitions: {dropped}")
+    return dropped
@@ -0,0 +1,230 @@
+"""
+Device presence
+Online/offline state of devices kept in a Redis bitmap indexed by Device.pk,
+driven by EMQX client connected/disconnected events
+
+Single check is one GETBIT, bulk check of many devices is one BITFIELD,
+online count is one BITCOUNT
+"""
+
+import logging
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.devices.models import Device
+from apps.main.async_redis import get_async_redis
+from apps.main.local_cache import LocalTTLCache
+from apps.main.lua_script import LuaScript
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_KEY = "devices:presence"
+# Last applied event timestamp per device, events older than it are ignored
+PRESENCE_TS_KEY = "devices:presence:ts"
+
+# Shared subscriptions and reconnects can deliver connect/disconnect events
+# out of order, so the bit is only changed by an event newer than the last
+SET_PRESENCE_SCRIPT = """
+local previous = redis.call('HGET', KEYS[2], ARGV[1])
+if previous and tonumber(previous) > tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[3])
+redis.call('SETBIT', KEYS[1], ARGV[1], ARGV[2])
+return 1
+"""
+set_presence_script = LuaScript(SET_PRESENCE_SCRIPT)
+
+# Old session of a device that already reconnected
+SUPERSEDED_REASONS = {"takenover", "discarded"}
+
+# BITFIELD GET operations per command
+BULK_CHUNK_SIZE = 1000
+
+# Username -> Device.pk, 0 for unknown usernames (kept for
+# DEVICE_ID_MISSING_TTL only, so new devices are picked up quickly)
+_device_ids = LocalTTLCache(
+    max_size=settings.DEVICE_ID_CACHE_SIZE,
+    ttl=settings.DEVICE_ID_CACHE_TTL,
+)
+
+
+def cache_device_id(username: str, device_id: Optional[int]):
+    if device_id:
+        _device_ids.set(username, device_id)
+    else:
+        _device_ids.set(username, 0, ttl=settings.DEVICE_ID_MISSING_TTL)
+
+
+def forget_device_id(username: str):
+    """Drop cached id of username (sync, called from model signals)"""
+    _device_ids.delete(username)
+
+
+async def resolve_device_id(username: str) -> Optional[int]:
+    """
+    Get Device.pk of username (cached in process)
+
+    Args:
+        username: Device username
+
+    Returns:
+        Device id or None if there is no such device
+    """
+    device_id = _device_ids.get(username)
+    if device_id is None:
+        device_id = (
+            await Device.objects.filter(username=username)
+            .values_list("id", flat=True)
+            .afirst()
+        )
+        # 0 marks unknown usernames (root user, other services)
+        cache_device_id(username, device_id)
+    return device_id or None
+
+
+async def resolve_device_ids(usernames: Iterable[str]) -> dict[str, int]:
+    """
+    Get Device.pk of many usernames, querying only ones not cached
+
+    Args:
+        usernames: Device usernames
+
+    Returns:
+        Known username -> device id mapping
+    """
+    result = {}
+    missing = set()
+    for username in usernames:
+        device_id = _device_ids.get(username)
+        if device_id is None:
+            missing.add(username)
+        elif device_id:
+            result[username] = device_id
+    if missing:
+        found = {
+            username: device_id
+            async for username, device_id in Device.objects.filter(
+                username__in=missing
+            ).values_list("username", "id")
+        }
+        for username in missing:
+            cache_device_id(username, found.get(username))
+        result.update(found)
+    return result
+
+
+async def async_set_device_presence(device_id: int, online: bool, ts: int) -> bool:
+    """
+    Record device presence change
+
+    Args:
+        device_id: Device.pk
+        online: New state
+        ts: Event timestamp (ms)
+
+    Returns:
+        bool: False if a newer event was already applied
+    """
+    applied = await set_presence_script(
+        get_async_redis(),
+        keys=[PRESENCE_KEY, PRESENCE_TS_KEY],
+        args=[device_id, int(online), ts],
+    )
+    return bool(applied)
+
+
+async def handle_client_event(data: dict, online: bool):
+    """
+    Apply EMQX $SYS client connected/disconnected event
+
+    Args:
+        data: Event payload
+        online: True for connected, False for disconnected
+    """
+    username = data.get("username")
+    if not username or username == settings.MQTT_USERNAME:
+        return
+    if not online and data.get("reason") in SUPERSEDED_REASONS:
+        return
+
+    device_id = await resolve_device_id(username)
+    if device_id is None:
+        return
+
+    ts = data.get("ts") or data.get("connected_at") or data.get("disconnected_at")
+    if not await async_set_device_presence(device_id, online, int(ts or 0)):
+        logger.debug(f"Stale presence event of {username} ignored")
+
+
+def _bitfield_get(redis, device_ids: list[int]):
+    bitfield = redis.bitfield(PRESENCE_KEY)
+    for device_id in device_ids:
+        bitfield.get("u1", device_id)
+    return bitfield
+
+
+# -------- sync API --------
+def is_device_online(device_id: int) -> bool:
+    return bool(cache.client.get_client().getbit(PRESENCE_KEY, device_id))
+
+
+def are_devices_online(device_ids: Iterable[int]) -> dict[int, bool]:
+    """
+    Check presence of many devices with one BITFIELD per chunk
+
+    Args:
+        device_ids: Device ids
+
+    Returns:
+        Device id -> online mapping
+    """
+    device_ids = list(device_ids)
+    redis = cache.client.get_client()
+    result = {}
+    for i in range(0, len(device_ids), BULK_CHUNK_SIZE):
+        chunk = device_ids[i : i + BULK_CHUNK_SIZE]
+        result.update(zip(chunk, map(bool, _bitfield_get(redis, chunk).execute())))
+    return result
+
+
+def online_device_count() -> int:
+    return cache.client.get_client().bitcount(PRESENCE_KEY)
+
+
+def clear_device_presence(device_id: int):
+    """
+    Forget presence of deleted device
+
+    Args:
+        device_id: Device.pk
+    """
+    try:
+        pipe = cache.client.get_client().pipeline(transaction=True)
+        pipe.setbit(PRESENCE_KEY, device_id, 0)
+        pipe.hdel(PRESENCE_TS_KEY, device_id)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Failed to clear presence of device {device_id}: {e}")
+
+
+# -------- async API --------
+async def async_is_device_online(device_id: int) -> bool:
+    return bool(await get_async_redis().getbit(PRESENCE_KEY, device_id))
+
+
+async def async_are_devices_online(device_ids: Iterable[int]) -> dict[int, bool]:
+    device_ids = list(device_ids)
+    redis = get_async_redis()
+    result = {}
+    for i in range(0, len(device_ids), BULK_CHUNK_SIZE):
+        chunk = device_ids[i : i + BULK_CHUNK_SIZE]
+        values = await _bitfield_get(redis, chunk).execute()
+        result.update(zip(chunk, map(bool, values)))
+    return result
+
+
+async def async_online_device_count() -> int:
+    return await get_async_redis().bitcount(PRESENCE_KEY)
@@ -0,0 +1,150 @@
+"""
+Telemetry rollups
+Per-device per-minute and per-hour aggregates maintained incrementally
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.devices.models import (
+    DeviceEvent,
+    DeviceHourRollup,
+    DeviceMinuteRollup,
+    DeviceStatus,
+)
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_KEY = "devices:rollups:watermark"
+
+# Buckets are recomputed from source rows and upserted, so processing the
+# same range twice is harmless and late rows are picked up by the overlap
+MINUTE_ROLLUP_SQL = f"""
+    WITH raw AS (
+        SELECT device_id, date_trunc('minute', received_at) AS bucket,
+               1 AS is_status, data, received_at
+        FROM {DeviceStatus._meta.db_table}
+        WHERE received_at >= %(start)s AND received_at < %(end)s
+        UNION ALL
+        SELECT device_id, date_trunc('minute', received_at) AS bucket,
+               0 AS is_status, NULL AS data, received_at
+        FROM {DeviceEvent._meta.db_table}
+        WHERE received_at >= %(start)s AND received_at < %(end)s
+    )
+    INSERT INTO {DeviceMinuteRollup._meta.db_table} (
+        device_id, bucket, status_count, event_count, last_status, last_received_at
+    )
+    SELECT device_id, bucket,
+           SUM(is_status), SUM(1 - is_status),
+           (ARRAY_AGG(data ORDER BY received_at DESC)
+               FILTER (WHERE is_status = 1))[1],
+           MAX(received_at)
+    FROM raw
+    GROUP BY device_id, bucket
+    ON CONFLICT (device_id, bucket) DO UPDATE SET
+        status_count = EXCLUDED.status_count,
+        event_count = EXCLUDED.event_count,
+        last_status = EXCLUDED.last_status,
+        last_received_at = EXCLUDED.last_received_at
+"""
+
+HOUR_ROLLUP_SQL = f"""
+    INSERT INTO {DeviceHourRollup._meta.db_table} (
+        device_id, bucket, status_count, event_count, last_status, last_received_at
+    )
+    SELECT device_id, date_trunc('hour', bucket),
+           SUM(status_count), SUM(event_count),
+           (ARRAY_AGG(last_status ORDER BY bucket DESC)
+               FILTER (WHERE last_status IS NOT NULL))[1],
+           MAX(last_received_at)
+    FROM {DeviceMinuteRollup._meta.db_table}
+    WHERE bucket >= %(start)s AND bucket < %(end)s
+    GROUP BY device_id, date_trunc('hour', bucket)
+    ON CONFLICT (device_id, bucket) DO UPDATE SET
+        status_count = EXCLUDED.status_count,
+        event_count = EXCLUDED.event_count,
+        last_status = EXCLUDED.last_status,
+        last_received_at = EXCLUDED.last_received_at
+"""
+
+
+def floor_time(value: datetime, step: timedelta) -> datetime:
+    """
+    Round datetime down to a multiple of step (UTC based)
+
+    Args:
+        value: Datetime to round
+        step: Bucket size (minute or hour)
+
+    Returns:
+        Start of the bucket containing value
+    """
+    epoch = datetime(1970, 1, 1, tzinfo=value.tzinfo)
+    return value - (value - epoch) % step
+
+
+def update_rollups(
+    lag: timedelta, max_window: timedelta, now: Optional[datetime] = None
+) -> Optional[tuple[datetime, datetime]]:
+    """
+    Aggregate raw rows received since the last run into minute and hour rollups
+
+    Args:
+        lag: Minutes newer than now - lag are left for the next run, so rows
+            still buffered by the ingestor are not missed
+        max_window: Max range processed per run. The first run starts at
+            now - max_window, after downtime runs go on from the watermark
+            and catch up max_window at a time
+        now: Current time, defaults to now
+
+    Returns:
+        Processed [start, end) range, or None if there was nothing to do
+    """
+    minute = timedelta(minutes=1)
+    hour = timedelta(hours=1)
+
+    end = floor_time((now or timezone.now()) - lag, minute)
+    watermark = cache.get(WATERMARK_KEY)
+    if watermark:
+        # One minute of overlap picks up rows flushed late into the last bucket
+        start = watermark - minute
+        end = min(end, start + max_window)
+    else:
+        start = end - max_window
+    if start >= end:
+        return None
+
+    hour_start = floor_time(start, hour)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(MINUTE_ROLLUP_SQL, {"start": start, "end": end})
+        minutes = cursor.rowcount
+        cursor.execute(HOUR_ROLLUP_SQL, {"start": hour_start, "end": end})
+        hours = cursor.rowcount
+
+    cache.set(WATERMARK_KEY, end, timeout=None)
+    logger.info(
+        f"Device rollups updated for [{start}, {end}): "
+        f"{minutes} minute and {hours} hour buckets"
+    )
+    return start, end
+
+
+def delete_old_rollups(minute_retention: timedelta, hour_retention: timedelta):
+    """
+    Delete rollup rows older than retention
+
+    Args:
+        minute_retention: How long minute buckets are kept
+        hour_retention: How long hour buckets are kept
+    """
+    now = timezone.now()
+    minutes, _ = DeviceMinuteRollup.objects.filter(
+        bucket__lt=now - minute_retention
+    ).delete()
+    hours, _ = DeviceHourRollup.objects.filter(bucket__lt=now - hour_retention).delete()
+    logger.info(f"Deleted {minutes} minute and {hours} hour rollups past retention")
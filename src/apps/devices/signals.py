@@ -0,0 +1,72 @@
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from apps.devices.acl import invalidate_rules
+from apps.devices.auth_cache import invalidate_device
+from apps.devices.models import Device, TopicRule
+from apps.devices.presence import clear_device_presence, forget_device_id
+
+
+@receiver(pre_save, sender=Device)
+def invalidate_renamed_device(sender, instance: Device, **kwargs):
+    # Credentials and rules are cached by username, so drop the old one too
+    if instance.pk is None:
+        return
+    old_username = (
+        Device.objects.filter(pk=instance.pk).values_list("username", flat=True).first()
+    )
+    if old_username and old_username != instance.username:
+        invalidate_device(old_username)
+        invalidate_rules([old_username])
+        forget_device_id(old_username)
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+def invalidate_device_credentials(sender, instance: Device, **kwargs):
+    invalidate_device(instance.username)
+    invalidate_rules([instance.username])
+    forget_device_id(instance.username)
+
+
+@receiver(post_delete, sender=Device)
+def clear_deleted_device_presence(sender, instance: Device, **kwargs):
+    clear_device_presence(instance.pk)
+
+
+@receiver(m2m_changed, sender=Device.groups.through)
+def invalidate_group_members(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # device.groups changed
+        usernames = [instance.username] if action.startswith("post_") else []
+    elif action == "pre_clear":
+        # group.devices.clear(): members are unknown once cleared
+        usernames = list(instance.devices.values_list("username", flat=True))
+    elif action in ("post_add", "post_remove"):
+        usernames = list(
+            Device.objects.filter(pk__in=pk_set).values_list("username", flat=True)
+        )
+    else:
+        usernames = []
+    invalidate_rules(usernames)
+
+
+@receiver(post_save, sender=TopicRule)
+@receiver(pre_delete, sender=TopicRule)
+def invalidate_rule_targets(sender, instance: TopicRule, **kwargs):
+    # pre_delete, so group members are still known when a group is deleted
+    if instance.device_id:
+        usernames = [instance.device.username]
+    else:
+        usernames = list(
+            Device.objects.filter(groups=instance.group_id).values_list(
+                "username", flat=True
+            )
+        )
+    invalidate_rules(usernames)
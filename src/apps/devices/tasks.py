@@ -0,0 +1,49 @@
+"""
+Celery tasks for devices app
+"""
+
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+import logging
+
+from apps.devices.partitions import create_partitions, drop_partitions
+from apps.devices.rollups import delete_old_rollups, update_rollups
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def maintain_telemetry_partitions():
+    """
+    Create upcoming daily telemetry partitions, drop ones past retention
+    and delete old rollups
+
+    Scheduled every 6 hours via CELERY_BEAT_SCHEDULE (idempotent, so a
+    missed run doesn't leave a day without partition)
+    """
+    created = create_partitions(settings.DEVICE_TELEMETRY_PARTITIONS_AHEAD)
+    dropped = drop_partitions(settings.DEVICE_TELEMETRY_RETENTION_DAYS)
+    delete_old_rollups(
+        minute_retention=timedelta(days=settings.DEVICE_MINUTE_ROLLUP_RETENTION_DAYS),
+        hour_retention=timedelta(days=settings.DEVICE_HOUR_ROLLUP_RETENTION_DAYS),
+    )
+    return {"created": created, "dropped": dropped}
+
+
+@shared_task
+def update_telemetry_rollups():
+    """
+    Aggregate new raw telemetry into minute/hour rollups
+
+    Scheduled every minute via CELERY_BEAT_SCHEDULE
+    """
+    processed = update_rollups(
+        lag=timedelta(seconds=settings.DEVICE_ROLLUP_LAG_SECONDS),
+        max_window=timedelta(hours=settings.DEVICE_ROLLUP_MAX_WINDOW_HOURS),
+    )
+    if processed is None:
+        return None
+    start, end = processed
+    return {"start": start.isoformat(), "end": end.isoformat()}
@@ -0,0 +1,56 @@
+"""
+Async Redis client
+Native redis.asyncio connection pool shared by long-running async services
+
+Meant for long-lived loops (ASGI workers, MQTT publisher and handler), whose
+owner closes the pool with close_async_redis() on shutdown (MQTT commands,
+channel layer flush/close_pools). Sync code should use
+``cache.client.get_client()``: an ``async_to_sync`` call runs on a fresh loop
+that nobody closes the pool for.
+"""
+
+import asyncio
+import weakref
+
+import redis.asyncio as aioredis
+from django.conf import settings
+
+# redis.asyncio connections are bound to the event loop they were created in,
+# so every loop (publisher, handler, ASGI worker) gets its own pool
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aioredis.Redis]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_redis() -> aioredis.Redis:
+    """
+    Get asyncio Redis client for the running event loop
+
+    Points to the same database as the default Django cache, so keys written
+    via ``cache.client.get_client()`` are visible here as well.
+
+    Returns:
+        redis.asyncio.Redis client backed by a blocking connection pool
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        pool = aioredis.BlockingConnectionPool.from_url(
+            settings.CACHES["default"]["LOCATION"],
+            max_connections=settings.REDIS_ASYNC_MAX_CONNECTIONS,
+            health_check_interval=30,
+        )
+        client = aioredis.Redis(connection_pool=pool)
+        _clients[loop] = client
+    return client
+
+
+async def close_async_redis():
+    """
+    Close pool of the running event loop
+
+    The next get_async_redis() call on this loop opens a new pool.
+    """
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose(close_connection_pool=True)
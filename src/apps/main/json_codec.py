@@ -0,0 +1,76 @@
+"""
+JSON codec
+Shared fast-path JSON encoding for MQTT and WebSocket message paths
+Uses orjson or msgspec when installed, stdlib json otherwise
+"""
+
+import json
+from typing import Any, Union
+
+# dumps(obj) -> compact UTF-8 JSON bytes, non-str dict keys stringified like stdlib
+# loads(bytes | str) -> object, raises one of JSONDecodeError on invalid input
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - optional dependency
+    msgspec = None
+
+
+if orjson is not None:
+    BACKEND = "orjson"
+    JSONDecodeError = (orjson.JSONDecodeError,)
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+        return orjson.loads(data)
+
+elif msgspec is not None:
+    BACKEND = "msgspec"
+    JSONDecodeError = (msgspec.DecodeError,)
+    _encoder = msgspec.json.Encoder()
+    _decoder = msgspec.json.Decoder()
+    # msgspec handles str/int/float keys only, stdlib also takes bool/None
+    _fallback_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def dumps(obj: Any) -> bytes:
+        try:
+            return _encoder.encode(obj)
+        except TypeError:
+            return _fallback_encoder.encode(obj).encode()
+
+    def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+        return _decoder.decode(data)
+
+else:
+    BACKEND = "json"
+    JSONDecodeError = (json.JSONDecodeError, UnicodeDecodeError)
+    # Compact separators match orjson/msgspec output
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def dumps(obj: Any) -> bytes:
+        return _encoder.encode(obj).encode()
+
+    def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+
+def dumps_str(obj: Any) -> str:
+    """
+    Serialize object to JSON text (for APIs that require str)
+
+    Args:
+        obj: JSON-serializable object
+
+    Returns:
+        str: Encoded JSON
+    """
+    return dumps(obj).decode()
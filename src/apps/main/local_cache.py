@@ -0,0 +1,55 @@
+"""
+Local TTL cache
+Bounded in-process LRU with per-entry expiry, used in front of Redis for
+hot lookups (device credentials, ACL rules)
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class LocalTTLCache:
+    """
+    Small LRU cache with TTL
+
+    Not shared between processes: TTL bounds how long a process may serve an
+    entry that was invalidated elsewhere.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        """
+        Args:
+            max_size: Max entries, least recently used ones are evicted
+            ttl: Seconds an entry stays valid
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store value, ttl overrides the cache TTL (e.g. shorter for misses)"""
+        self._entries[key] = (
+            time.monotonic() + (self.ttl if ttl is None else ttl),
+            value,
+        )
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
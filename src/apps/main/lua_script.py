@@ -0,0 +1,31 @@
+"""
+Lua script
+Redis Lua scripts called by SHA1 instead of sending the source every time
+"""
+
+import redis.asyncio as aioredis
+from redis.commands.core import AsyncScript, Script
+
+
+class LuaScript:
+    """
+    Lua script called by EVALSHA with sync or asyncio clients and pipelines
+
+    Only the SHA1 is sent; redis-py loads the script on NOSCRIPT, and
+    pipelines load missing scripts before executing.
+    """
+
+    def __init__(self, source: str):
+        # Scripts are always called with client=, no registered client needed
+        self._sync = Script(None, source.encode())
+        self._async = AsyncScript(None, source.encode())
+
+    def __call__(self, client, keys=(), args=()):
+        """
+        Run script (or queue it on a pipeline)
+
+        Returns:
+            Script result, an awaitable for asyncio clients
+        """
+        script = self._async if isinstance(client, aioredis.Redis) else self._sync
+        return script(keys=keys, args=args, client=client)
@@ -0,0 +1,12 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from websocket.auth import invalidate_user
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_token_user(sender, instance, **kwargs):
+    # WebSocket tokens of deactivated/deleted users are refused on next connect
+    invalidate_user(instance.pk)
@@ -1,11 +1,19 @@
 from django.urls import path
 
-from apps.main.views import IndexView, check_mqtt_user, health_check
+from apps.main.views import (
+    IndexView,
+    check_mqtt_acl,
+    check_mqtt_user,
+    health_check,
+    websocket_token,
+)
 
 app_name = "main"
 
 urlpatterns = [
     path("health/", health_check, name="health"),
     path("check-mqtt-user/", check_mqtt_user, name="check_mqtt_user"),
+    path("check-mqtt-acl/", check_mqtt_acl, name="check_mqtt_acl"),
+    path("ws-token/", websocket_token, name="websocket_token"),
     path("", IndexView.as_view(), name="index"),
 ]
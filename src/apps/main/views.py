@@ -1,8 +1,14 @@
+import hmac
+
 from django.conf import settings
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import TemplateView
 
+from apps.devices.acl import authorize_device
+from apps.devices.auth_cache import authenticate_device
+from websocket.auth import create_token
+
 
 @csrf_exempt
 def health_check(request):
@@ -10,23 +16,64 @@ def health_check(request):
     return JsonResponse({"status": "healthy"}, status=200)
 
 
+def websocket_token(request):
+    """
+    Signed token for ws/connect/?token=..., lets the socket connect without
+    a session/user lookup (reuse it for reconnects until it expires)
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({"detail": "Authentication required"}, status=401)
+    return JsonResponse(
+        {
+            "token": create_token(request.user.pk),
+            "expires_in": settings.WS_TOKEN_MAX_AGE,
+        }
+    )
+
+
 @csrf_exempt
-def check_mqtt_user(request):
-    """Endpoint to verify MQTT user credentials"""
+async def check_mqtt_user(request):
+    """
+    Endpoint to verify MQTT user credentials (EMQX HTTP auth)
+
+    Backend services use the root credentials, devices are checked against
+    Device passwords via the credential cache (no DB query on cache hit)
+    """
     username = request.POST.get("username")
     password = request.POST.get("password")
 
-    # Replace these with your actual MQTT credentials
-    VALID_USERNAME = settings.MQTT_USERNAME
-    VALID_PASSWORD = settings.MQTT_PASSWORD
-
-    print(f"{username=}, {password=}, {VALID_USERNAME=}, {VALID_PASSWORD=}")
+    if username == settings.MQTT_USERNAME:
+        authenticated = hmac.compare_digest(
+            (password or "").encode(), settings.MQTT_PASSWORD.encode()
+        )
+    else:
+        authenticated = await authenticate_device(username, password)
 
-    if username == VALID_USERNAME and password == VALID_PASSWORD:
+    if authenticated:
         return JsonResponse({"authenticated": True}, status=200)
     else:
         return JsonResponse({"authenticated": False}, status=401)
 
 
+@csrf_exempt
+async def check_mqtt_acl(request):
+    """
+    Endpoint to authorize MQTT publish/subscribe (EMQX HTTP authorization)
+
+    Expects "username", "action" ("publish"/"subscribe") and "topic", answers
+    with EMQX {"result": "allow" | "deny"} from the precompiled rule cache
+    """
+    username = request.POST.get("username")
+    action = request.POST.get("action")
+    topic = request.POST.get("topic")
+
+    if username == settings.MQTT_USERNAME:
+        allowed = True
+    else:
+        allowed = await authorize_device(username, action, topic)
+
+    return JsonResponse({"result": "allow" if allowed else "deny"}, status=200)
+
+
 class IndexView(TemplateView):
     template_name = "main/index.html"
@@ -0,0 +1,490 @@
+"""
+MQTT device commands
+Downlink commands with correlation ids, tracked until the device replies on
+from_device/<username>/event or the command times out
+
+Every command is a Redis hash (mqtt:command:<id>) that expires with the
+command timeout, so web, Celery, handler and publisher processes all see the
+same state without touching the DB. Status changes are announced on a pub/sub
+channel; async waiters share one subscription per event loop, sync callers
+poll the hash.
+
+Device protocol:
+    to_device/<username>          {"id": "<id>", "cmd": "reboot", "params": {}}
+    from_device/<username>/event  {"reply_to": "<id>", "status": "received"}
+                                  {"reply_to": "<id>", "status": "ok" | "error",
+                                   "result": ...}
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+import weakref
+from typing import Any, NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.main import json_codec
+from apps.main.async_redis import get_async_redis
+from apps.main.lua_script import LuaScript
+
+logger = logging.getLogger(__name__)
+
+COMMAND_KEY_PREFIX = "mqtt:command:"
+# Pub/sub channel of "<id> <status>" notifications
+UPDATES_CHANNEL = "mqtt:commands"
+
+QUEUED = "queued"
+SENT = "sent"  # Broker acknowledged the publish
+ACKED = "acked"  # Device received the command
+DONE = "done"
+FAILED = "failed"
+
+# Statuses only move forward: a late "sent" from the publisher never
+# overwrites an ack the device already sent
+STATUS_RANK = {QUEUED: 0, SENT: 1, ACKED: 2, DONE: 3, FAILED: 3}
+FINAL_STATUSES = {DONE, FAILED}
+
+# Device reply "status" -> command status
+REPLY_STATUSES = {"received": ACKED, "ok": DONE, "error": FAILED}
+
+# KEYS[1] command hash
+# ARGV: username ("" skips the check), status, rank, result ("" keeps it),
+#       timestamp, new TTL (0 keeps it), channel, command id
+UPDATE_SCRIPT = """
+local current = redis.call('HMGET', KEYS[1], 'username', 'rank')
+if not current[2] then
+    return 0
+end
+if ARGV[1] ~= '' and current[1] ~= ARGV[1] then
+    return 0
+end
+if tonumber(current[2]) >= tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'status', ARGV[2], 'rank', ARGV[3], 'updated_at', ARGV[5])
+if ARGV[4] ~= '' then
+    redis.call('HSET', KEYS[1], 'result', ARGV[4])
+end
+if tonumber(ARGV[6]) > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[6])
+end
+redis.call('PUBLISH', ARGV[7], ARGV[8] .. ' ' .. ARGV[2])
+return 1
+"""
+update_script = LuaScript(UPDATE_SCRIPT)
+
+
+def command_key(command_id: str) -> str:
+    return f"{COMMAND_KEY_PREFIX}{command_id}"
+
+
+class Command(NamedTuple):
+    """Command state read from Redis"""
+
+    id: str
+    username: str
+    command: str
+    status: str
+    result: Any
+    created_at: float
+    updated_at: float
+    expires_at: float
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINAL_STATUSES
+
+
+def parse_command(command_id: str, data: dict) -> Optional[Command]:
+    """
+    Build Command from HGETALL reply
+
+    Args:
+        command_id: Correlation id
+        data: Hash fields (bytes keys and values)
+
+    Returns:
+        Command or None if the hash is gone (unknown or timed out)
+    """
+    if not data:
+        return None
+    fields = {key.decode(): value.decode() for key, value in data.items()}
+    result = fields.get("result")
+    return Command(
+        id=command_id,
+        username=fields["username"],
+        command=fields["command"],
+        status=fields["status"],
+        result=None if result is None else json_codec.loads(result),
+        created_at=float(fields["created_at"]),
+        updated_at=float(fields["updated_at"]),
+        expires_at=float(fields["expires_at"]),
+    )
+
+
+class UpdateListener:
+    """
+    Pub/sub subscription of one event loop, wakes local waiters of a command
+    when its status changes
+
+    Waiters always re-read the hash after waking, so notifications only carry
+    the id and missed ones (reconnects) cost at most a wake-up of everyone.
+    """
+
+    READY_TIMEOUT = 5  # seconds
+
+    def __init__(self):
+        self.waiters: dict[str, set[asyncio.Future]] = {}
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start subscription task and wait until it is subscribed"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+        try:
+            await asyncio.wait_for(self._ready.wait(), self.READY_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("Commands: updates subscription is not ready")
+
+    def watch(self, command_id: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(command_id, set()).add(future)
+        return future
+
+    def unwatch(self, command_id: str, future: asyncio.Future):
+        futures = self.waiters.get(command_id)
+        if futures is not None:
+            futures.discard(future)
+            if not futures:
+                del self.waiters[command_id]
+
+    def wake(self, command_ids):
+        for command_id in command_ids:
+            for future in self.waiters.get(command_id, ()):
+                if not future.done():
+                    future.set_result(None)
+
+    async def _listen(self):
+        while True:
+            pubsub = get_async_redis().pubsub()
+            try:
+                await pubsub.subscribe(UPDATES_CHANNEL)
+                self._ready.set()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        command_id = message["data"].decode().partition(" ")[0]
+                        self.wake([command_id])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._ready.clear()
+                logger.error(f"Commands: updates subscription failed: {e}")
+                # Updates may have been missed while disconnected
+                self.wake(list(self.waiters))
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+# Listener per event loop (pub/sub connections are bound to their loop)
+_listeners: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, UpdateListener]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_update_listener() -> UpdateListener:
+    loop = asyncio.get_running_loop()
+    listener = _listeners.get(loop)
+    if listener is None:
+        listener = _listeners[loop] = UpdateListener()
+    return listener
+
+
+class DeviceCommands:
+    """Send commands to devices and track their replies"""
+
+    def build(
+        self, username: str, command: str, params: Optional[dict], timeout: float
+    ) -> tuple[str, dict, dict]:
+        """
+        Create correlation id, pending record and MQTT payload of a command
+
+        Returns:
+            Command id, hash fields and payload
+        """
+        command_id = uuid.uuid4().hex
+        now = time.time()
+        record = {
+            "username": username,
+            "command": command,
+            "status": QUEUED,
+            "rank": STATUS_RANK[QUEUED],
+            "created_at": now,
+            "updated_at": now,
+            "expires_at": now + timeout,
+        }
+        payload = {"id": command_id, "cmd": command, "params": params or {}}
+        return command_id, record, payload
+
+    def send(
+        self,
+        username: str,
+        command: str,
+        params: Optional[dict] = None,
+        timeout: Optional[float] = None,
+    ) -> Optional[str]:
+        """
+        Queue command for device (sync context)
+
+        Args:
+            username: Device username
+            command: Command name
+            params: Command parameters
+            timeout: Seconds the command stays pending (default
+                MQTT_COMMAND_TIMEOUT)
+
+        Returns:
+            Command id or None if it couldn't be queued
+
+        Usage:
+            from apps.mqtt_service.commands import device_commands
+            command_id = device_commands.send("device_001", "reboot")
+            command = device_commands.wait(command_id, timeout=10)
+        """
+        # Imported here, publisher_client imports this module
+        from apps.mqtt_service.mqtt_publisher import mqtt_publisher
+
+        timeout = timeout or settings.MQTT_COMMAND_TIMEOUT
+        command_id, record, payload = self.build(username, command, params, timeout)
+        key = command_key(command_id)
+
+        redis = cache.client.get_client()
+        # Stored before publishing, so a fast reply always finds it
+        pipe = redis.pipeline()
+        pipe.hset(key, mapping=record)
+        pipe.expire(key, max(1, round(timeout)))
+        pipe.execute()
+
+        if not mqtt_publisher.publish(
+            f"to_device/{username}",
+            payload,
+            qos=1,
+            priority="high",
+            command_id=command_id,
+        ):
+            redis.delete(key)
+            return None
+        return command_id
+
+    async def send_async(
+        self,
+        username: str,
+        command: str,
+        params: Optional[dict] = None,
+        timeout: Optional[float] = None,
+    ) -> Optional[str]:
+        """
+        Queue command for device (async context)
+
+        Usage:
+            from apps.mqtt_service.commands import device_commands
+            command_id = await device_commands.send_async("device_001", "reboot")
+            command = await device_commands.wait_async(command_id)
+        """
+        from apps.mqtt_service.mqtt_publisher import mqtt_publisher
+
+        timeout = timeout or settings.MQTT_COMMAND_TIMEOUT
+        command_id, record, payload = self.build(username, command, params, timeout)
+        key = command_key(command_id)
+
+        redis = get_async_redis()
+        pipe = redis.pipeline()
+        pipe.hset(key, mapping=record)
+        pipe.expire(key, max(1, round(timeout)))
+        await pipe.execute()
+
+        if not await mqtt_publisher.publish_async(
+            f"to_device/{username}",
+            payload,
+            qos=1,
+            priority="high",
+            command_id=command_id,
+        ):
+            await redis.delete(key)
+            return None
+        return command_id
+
+    def get(self, command_id: str) -> Optional[Command]:
+        """
+        Read command state (sync context)
+
+        Returns:
+            Command or None if it is unknown or timed out
+        """
+        data = cache.client.get_client().hgetall(command_key(command_id))
+        return parse_command(command_id, data)
+
+    async def get_async(self, command_id: str) -> Optional[Command]:
+        """Read command state (async context)"""
+        data = await get_async_redis().hgetall(command_key(command_id))
+        return parse_command(command_id, data)
+
+    def wait(
+        self, command_id: str, timeout: Optional[float] = None, interval: float = 0.2
+    ) -> Optional[Command]:
+        """
+        Poll command until it is done (sync context)
+
+        Args:
+            command_id: Correlation id
+            timeout: Max seconds to wait (default: until the command expires)
+            interval: Seconds between polls
+
+        Returns:
+            Final command, latest state if timeout elapsed first, or None if
+            the command is unknown or timed out
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            command = self.get(command_id)
+            if command is None or command.done:
+                return command
+            if deadline is None:
+                deadline = time.monotonic() + command.expires_at - time.time()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return command
+            time.sleep(min(interval, remaining))
+
+    async def wait_async(
+        self, command_id: str, timeout: Optional[float] = None, interval: float = 0.5
+    ) -> Optional[Command]:
+        """
+        Wait until command is done (async context), woken by pub/sub
+
+        The hash is also re-read every interval, so a subscription that isn't
+        ready or dropped doesn't hold the waiter until timeout.
+
+        Args:
+            command_id: Correlation id
+            timeout: Max seconds to wait (default: until the command expires)
+            interval: Max seconds between reads
+
+        Returns:
+            Final command, latest state if timeout elapsed first, or None if
+            the command is unknown or timed out
+        """
+        loop = asyncio.get_running_loop()
+        listener = get_update_listener()
+        await listener.start()
+
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            # Watch before reading, so an update between the two isn't missed
+            future = listener.watch(command_id)
+            try:
+                command = await self.get_async(command_id)
+                if command is None or command.done:
+                    return command
+                if deadline is None:
+                    deadline = loop.time() + command.expires_at - time.time()
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return command
+                await asyncio.wait([future], timeout=min(interval, remaining))
+            finally:
+                listener.unwatch(command_id, future)
+
+    async def execute_async(
+        self,
+        username: str,
+        command: str,
+        params: Optional[dict] = None,
+        timeout: Optional[float] = None,
+    ) -> Optional[Command]:
+        """
+        Send command and wait for its result (async context)
+
+        Returns:
+            Final command, latest state if the device didn't finish in time,
+            or None if it couldn't be queued
+        """
+        command_id = await self.send_async(username, command, params, timeout)
+        if command_id is None:
+            return None
+        return await self.wait_async(command_id, timeout)
+
+    async def update_async(
+        self,
+        command_id: str,
+        status: str,
+        username: str = "",
+        result: Any = None,
+    ) -> bool:
+        """
+        Move command to a later status and notify waiters
+
+        Args:
+            command_id: Correlation id
+            status: New status
+            username: Device the update came from ("" skips the check)
+            result: Result to store (None keeps the current one)
+
+        Returns:
+            bool: True if the command was updated
+        """
+        ttl = settings.MQTT_COMMAND_RESULT_TTL if status in FINAL_STATUSES else 0
+        updated = await update_script(
+            get_async_redis(),
+            keys=[command_key(command_id)],
+            args=[
+                username,
+                status,
+                STATUS_RANK[status],
+                "" if result is None else json_codec.dumps(result),
+                time.time(),
+                ttl,
+                UPDATES_CHANNEL,
+                command_id,
+            ],
+        )
+        return bool(updated)
+
+    async def mark_sent_async(self, command_id: str) -> bool:
+        """Record broker acknowledgement of command publish"""
+        return await self.update_async(command_id, SENT)
+
+    async def handle_reply(self, username: str, data: dict) -> bool:
+        """
+        Apply device reply received on from_device/<username>/event
+
+        Replies of other devices, unknown statuses and commands that already
+        timed out are ignored.
+
+        Args:
+            username: Device username from topic
+            data: Reply payload with "reply_to", "status" and optional "result"
+
+        Returns:
+            bool: True if a pending command was updated
+        """
+        command_id = data.get("reply_to")
+        status = REPLY_STATUSES.get(data.get("status"))
+        if not isinstance(command_id, str) or status is None:
+            logger.warning(f"Commands: invalid reply from {username}: {data}")
+            return False
+
+        updated = await self.update_async(
+            command_id, status, username=username, result=data.get("result")
+        )
+        if not updated:
+            logger.debug(f"Commands: ignored reply from {username} to {command_id}")
+        return updated
+
+
+# Singleton instance
+device_commands = DeviceCommands()
@@ -0,0 +1,247 @@
+"""
+MQTT Queue Envelope
+Compact binary format of items stored in mqtt:publish_queue
+
+Layout (version 1):
+    1 byte   version (0x01)
+    1 byte   flags: bits 0-1 QoS, bit 2 retain, bit 3 command id present,
+             bit 4 attempts present, bits 5-6 priority lane (0 = highest),
+             bit 7 coalesce (only the latest pending payload of topic is sent)
+    2 bytes  topic length (big-endian)
+    N bytes  topic (UTF-8)
+    [1 byte  command id length, M bytes command id (UTF-8)]
+    [1 byte  failed publish attempts]
+    rest     raw MQTT payload bytes
+
+Legacy items are JSON objects ({"topic", "payload", "qos", "retain"}) and
+always start with "{", so both formats can be read during rollout
+"""
+
+import struct
+from typing import Any, NamedTuple, Optional
+
+from apps.main import json_codec
+
+VERSION = 1
+
+_HEADER = struct.Struct(">BBH")
+_RETAIN_FLAG = 0b100
+_QOS_MASK = 0b011
+_COMMAND_FLAG = 0b1000
+_ATTEMPTS_FLAG = 0b10000
+_LANE_SHIFT = 5
+_LANE_MASK = 0b11
+_COALESCE_FLAG = 0b10000000
+# Lane of items without one (legacy JSON items)
+DEFAULT_LANE = 1
+_LEGACY_PREFIX = ord("{")
+
+
+class EnvelopeError(ValueError):
+    """Queue item can't be decoded"""
+
+
+class QueuedMessage(NamedTuple):
+    """MQTT message read from the publish queue"""
+
+    topic: str
+    payload: bytes
+    qos: int = 1
+    retain: bool = False
+    # Correlation id of a device command (see apps.mqtt_service.commands)
+    command_id: Optional[str] = None
+    # Failed publish attempts so far (see apps.mqtt_service.publish_queue)
+    attempts: int = 0
+    # Priority lane (see apps.mqtt_service.publish_queue.PRIORITIES)
+    lane: int = DEFAULT_LANE
+    coalesce: bool = False
+
+
+def encode_payload(payload: Any) -> bytes:
+    """
+    Convert payload to MQTT payload bytes
+
+    Args:
+        payload: bytes (kept as is), dict/list (JSON-encoded) or any other value
+            (converted with str)
+
+    Returns:
+        bytes: Raw payload
+    """
+    if isinstance(payload, (bytes, bytearray)):
+        return bytes(payload)
+    if isinstance(payload, (dict, list)):
+        return json_codec.dumps(payload)
+    return str(payload).encode()
+
+
+def encode_envelope(
+    topic: str,
+    payload: Any,
+    qos: int = 1,
+    retain: bool = False,
+    command_id: Optional[str] = None,
+    attempts: int = 0,
+    lane: int = DEFAULT_LANE,
+    coalesce: bool = False,
+) -> bytes:
+    """
+    Build queue item for a single MQTT message
+
+    Args:
+        topic: MQTT topic
+        payload: Message payload (bytes, str, dict, list)
+        qos: Quality of Service level (0, 1, 2)
+        retain: Whether to retain the message
+        command_id: Correlation id the publisher reports delivery for
+        attempts: Failed publish attempts (set when the item is retried)
+        lane: Priority lane (0-3)
+        coalesce: Replace pending message of the same topic instead of
+            queueing another one
+
+    Returns:
+        bytes: Serialized queue item
+
+    Raises:
+        EnvelopeError: If topic, QoS, command id, attempts or lane are invalid
+    """
+    topic_bytes = topic.encode()
+    if not topic_bytes or len(topic_bytes) > 0xFFFF:
+        raise EnvelopeError(f"Invalid topic length: {len(topic_bytes)}")
+    if qos not in (0, 1, 2):
+        raise EnvelopeError(f"Invalid QoS: {qos}")
+
+    if lane not in range(_LANE_MASK + 1):
+        raise EnvelopeError(f"Invalid lane: {lane}")
+
+    flags = (
+        qos
+        | (_RETAIN_FLAG if retain else 0)
+        | (lane << _LANE_SHIFT)
+        | (_COALESCE_FLAG if coalesce else 0)
+    )
+    command_part = b""
+    if command_id is not None:
+        command_bytes = command_id.encode()
+        if not command_bytes or len(command_bytes) > 0xFF:
+            raise EnvelopeError(f"Invalid command id length: {len(command_bytes)}")
+        flags |= _COMMAND_FLAG
+        command_part = bytes([len(command_bytes)]) + command_bytes
+
+    attempts_part = b""
+    if attempts:
+        if not 0 < attempts <= 0xFF:
+            raise EnvelopeError(f"Invalid attempts: {attempts}")
+        flags |= _ATTEMPTS_FLAG
+        attempts_part = bytes([attempts])
+
+    return (
+        _HEADER.pack(VERSION, flags, len(topic_bytes))
+        + topic_bytes
+        + command_part
+        + attempts_part
+        + encode_payload(payload)
+    )
+
+
+def decode_envelope(data: bytes) -> QueuedMessage:
+    """
+    Decode queue item, detecting legacy JSON items
+
+    Args:
+        data: Raw item from Redis queue
+
+    Returns:
+        QueuedMessage
+
+    Raises:
+        EnvelopeError: If item is malformed or has unknown version
+    """
+    if not data:
+        raise EnvelopeError("Empty queue item")
+
+    if data[0] == _LEGACY_PREFIX:
+        return _decode_legacy(data)
+
+    if data[0] != VERSION:
+        raise EnvelopeError(f"Unknown envelope version: {data[0]}")
+    if len(data) < _HEADER.size:
+        raise EnvelopeError("Truncated envelope header")
+
+    _, flags, topic_length = _HEADER.unpack_from(data)
+    topic_end = _HEADER.size + topic_length
+    if len(data) < topic_end:
+        raise EnvelopeError("Truncated envelope topic")
+
+    try:
+        topic = data[_HEADER.size : topic_end].decode()
+    except UnicodeDecodeError as e:
+        raise EnvelopeError(f"Invalid topic: {e}") from e
+
+    command_id = None
+    payload_start = topic_end
+    if flags & _COMMAND_FLAG:
+        if len(data) <= topic_end:
+            raise EnvelopeError("Truncated envelope command id")
+        payload_start = topic_end + 1 + data[topic_end]
+        if len(data) < payload_start:
+            raise EnvelopeError("Truncated envelope command id")
+        try:
+            command_id = data[topic_end + 1 : payload_start].decode()
+        except UnicodeDecodeError as e:
+            raise EnvelopeError(f"Invalid command id: {e}") from e
+
+    attempts = 0
+    if flags & _ATTEMPTS_FLAG:
+        if len(data) <= payload_start:
+            raise EnvelopeError("Truncated envelope attempts")
+        attempts = data[payload_start]
+        payload_start += 1
+
+    return QueuedMessage(
+        topic=topic,
+        payload=bytes(data[payload_start:]),
+        qos=flags & _QOS_MASK,
+        retain=bool(flags & _RETAIN_FLAG),
+        command_id=command_id,
+        attempts=attempts,
+        lane=(flags >> _LANE_SHIFT) & _LANE_MASK,
+        coalesce=bool(flags & _COALESCE_FLAG),
+    )
+
+
+def retry_envelope(message: QueuedMessage) -> bytes:
+    """
+    Build queue item of a message with one more failed attempt
+
+    Args:
+        message: Decoded queue item
+
+    Returns:
+        bytes: Serialized queue item (compact envelope, also for legacy items)
+    """
+    return encode_envelope(
+        message.topic,
+        message.payload,
+        message.qos,
+        message.retain,
+        message.command_id,
+        message.attempts + 1,
+        message.lane,
+        message.coalesce,
+    )
+
+
+def _decode_legacy(data: bytes) -> QueuedMessage:
+    try:
+        message = json_codec.loads(data)
+        topic = message["topic"]
+    except (*json_codec.JSONDecodeError, KeyError, TypeError) as e:
+        raise EnvelopeError(f"Invalid legacy queue item: {e}") from e
+
+    return QueuedMessage(
+        topic=topic,
+        payload=encode_payload(message.get("payload", "")),
+        qos=message.get("qos", 1),
+        retain=message.get("retain", False),
+    )
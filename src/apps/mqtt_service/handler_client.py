@@ -6,11 +6,14 @@ Similar to publisher pattern for consistency
 
 import asyncio
 import logging
-from typing import Callable, Optional
+import zlib
+from typing import Callable, Iterable, Optional
 
 import aiomqtt
 from django.conf import settings
 
+from apps.mqtt_service.router import router
+
 logger = logging.getLogger(__name__)
 
 
@@ -24,13 +27,22 @@ class MQTTHandlerClient:
         self,
         message_handler: Callable,
         handler_id: str,
+        concurrency: int = 1,
+        lane_size: int = 100,
+        topics: Optional[Iterable[str]] = None,
     ):
         """
         Initialize MQTT handler client
 
         Args:
-            message_handler: Async callable to handle received messages
+            message_handler: Async callable (topic, payload bytes, message)
+                to handle received messages
             handler_id: Unique handler identifier for logging
+            concurrency: Number of worker lanes processing messages in parallel
+                (1 = process inline, one message at a time)
+            lane_size: Max messages buffered per lane before reading pauses
+            topics: Topic filters to subscribe to (default: routes registered
+                on the topic router)
         """
         self.broker_host = settings.MQTT_BROKER_HOST
         self.broker_port = settings.MQTT_BROKER_PORT
@@ -39,8 +51,12 @@ class MQTTHandlerClient:
 
         self.message_handler = message_handler
         self.handler_id = handler_id
+        self.concurrency = max(1, concurrency)
+        self.lane_size = lane_size
+        self.topics = list(topics) if topics is not None else None
         self._client: Optional[aiomqtt.Client] = None
         self._reconnect_interval = 5  # seconds
+        self._drain_timeout = 10  # seconds
 
     def create_client(self) -> aiomqtt.Client:
         """
@@ -69,19 +85,89 @@ class MQTTHandlerClient:
         Args:
             client: Connected MQTT client
         """
-        for topic in [
-            "from_device/+/status",
-            "from_device/+/event",
-            # Add your topics here
-        ]:
+        topics = self.topics if self.topics is not None else router.topic_filters()
+        if not topics:
+            logger.warning(f"Handler {self.handler_id}: No topics to subscribe to")
+
+        for topic in topics:
             # Shared subscription format: $share/{group_name}/{topic}
             shared_topic = f"$share/handlers/{topic}"
-            await client.subscribe(shared_topic, qos=1)
+            granted = await client.subscribe(shared_topic, qos=1)
+            # SUBACK code 0x80+ means the broker refused it, e.g. the $SYS rule
+            # in acl.conf doesn't name MQTT_ROOT_USERNAME
+            if any(code >= 128 for code in granted):
+                logger.error(
+                    f"Handler {self.handler_id}: Broker refused subscription to "
+                    f"{shared_topic}, check the broker ACL for user {self.username!r}"
+                )
+                continue
             logger.info(
                 f"Handler {self.handler_id}: Subscribed to shared topic: {shared_topic} "
                 f"(QoS=1)"
             )
 
+    async def process_message(self, message: aiomqtt.Message):
+        """
+        Process single MQTT message
+
+        Args:
+            message: Received MQTT message
+        """
+        try:
+            # Raw payload bytes are passed through, the handler decodes JSON
+            # straight from bytes
+            payload = message.payload
+            topic = str(message.topic)
+
+            # Call message handler if provided
+            if self.message_handler:
+                await self.message_handler(topic, payload, message)
+            else:
+                logger.info(
+                    f"Handler {self.handler_id}: Received message on topic '{topic}': {payload}"
+                )
+        except Exception as e:
+            logger.error(
+                f"Handler {self.handler_id}: Error processing message: {e}",
+                exc_info=True,
+            )
+
+    def lane_for(self, topic: str) -> int:
+        """
+        Pick worker lane for topic
+
+        Messages of the same device (from_device/<id>/...) always land on the same
+        lane, so they are processed in arrival order. Broker client events
+        ($SYS/brokers/<node>/clients/<clientid>/...) are keyed by client id.
+
+        Args:
+            topic: MQTT topic
+
+        Returns:
+            Lane index
+        """
+        if topic.startswith("$SYS/"):
+            levels = topic.split("/", 5)
+            key = levels[4] if len(levels) > 4 else topic
+        else:
+            levels = topic.split("/", 2)
+            key = levels[1] if len(levels) > 1 else topic
+        return zlib.crc32(key.encode()) % self.concurrency
+
+    async def lane_worker(self, lane: asyncio.Queue):
+        """
+        Process messages of a single lane sequentially
+
+        Args:
+            lane: Lane message queue
+        """
+        while True:
+            message = await lane.get()
+            try:
+                await self.process_message(message)
+            finally:
+                lane.task_done()
+
     async def handle_messages(self, client: aiomqtt.Client):
         """
         Listen and process incoming MQTT messages
@@ -89,24 +175,35 @@ class MQTTHandlerClient:
         Args:
             client: Connected MQTT client
         """
-        async for message in client.messages:
+        if self.concurrency == 1:
+            async for message in client.messages:
+                await self.process_message(message)
+            return
+
+        lanes = [asyncio.Queue(maxsize=self.lane_size) for _ in range(self.concurrency)]
+        workers = [asyncio.create_task(self.lane_worker(lane)) for lane in lanes]
+        try:
+            async for message in client.messages:
+                # Waits while the lane is full, so reading pauses instead of
+                # spawning unbounded work
+                await lanes[self.lane_for(str(message.topic))].put(message)
+        finally:
+            # Messages already received are acked on the broker side, so let the
+            # lanes finish them before reconnecting or shutting down
             try:
-                # Decode message payload
-                payload = message.payload.decode()
-                topic = str(message.topic)
-
-                # Call message handler if provided
-                if self.message_handler:
-                    await self.message_handler(topic, payload, message)
-                else:
-                    logger.info(
-                        f"Handler {self.handler_id}: Received message on topic '{topic}': {payload}"
-                    )
-            except Exception as e:
-                logger.error(
-                    f"Handler {self.handler_id}: Error processing message: {e}",
-                    exc_info=True,
+                await asyncio.wait_for(
+                    asyncio.gather(*(lane.join() for lane in lanes)),
+                    timeout=self._drain_timeout,
+                )
+            except asyncio.TimeoutError:
+                logger.warning(
+                    f"Handler {self.handler_id}: Lanes not drained within "
+                    f"{self._drain_timeout}s, dropping "
+                    f"{sum(lane.qsize() for lane in lanes)} pending messages"
                 )
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
 
     async def publish(
         self, topic: str, payload: str, qos: int = 1, retain: bool = False
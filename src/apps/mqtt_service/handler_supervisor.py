@@ -0,0 +1,194 @@
+"""
+MQTT Handler Supervisor
+Runs several handler worker processes and restarts them when they die
+All workers join the same $share/handlers/... shared subscription
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import signal
+import time
+from typing import Optional
+
+from django import db
+
+from apps.main.async_redis import close_async_redis
+from apps.mqtt_service.handler_client import MQTTHandlerClient
+from apps.mqtt_service.mqtt_handlers import MessageHandler
+
+logger = logging.getLogger(__name__)
+
+
+async def run_handler(handler_id: str, concurrency: int = 1):
+    """
+    Run MQTT handler with message processor
+
+    Args:
+        handler_id: Unique identifier for this handler instance
+        concurrency: Number of worker lanes processing messages in parallel
+    """
+    # Initialize message handler
+    handler = MessageHandler()
+
+    # Initialize MQTT handler client
+    client = MQTTHandlerClient(
+        message_handler=handler.handle_message,
+        handler_id=handler_id,
+        concurrency=concurrency,
+    )
+
+    # Cancel on SIGTERM/SIGINT, so in-flight lanes are drained before exit
+    task = asyncio.current_task()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, task.cancel)
+
+    await handler.start()
+    try:
+        # Run client (with auto-reconnect)
+        await client.run()
+    finally:
+        await handler.stop()
+        await close_async_redis()
+
+
+def handler_worker(handler_id: str, concurrency: int):
+    """
+    Entry point of a single worker process
+
+    Args:
+        handler_id: Unique identifier for this worker
+        concurrency: Number of worker lanes processing messages in parallel
+    """
+    try:
+        asyncio.run(run_handler(handler_id, concurrency))
+    except KeyboardInterrupt:
+        pass
+
+
+class HandlerSupervisor:
+    """
+    Forks N handler processes and keeps them running until shutdown
+    """
+
+    def __init__(
+        self,
+        handler_id: str,
+        processes: int,
+        concurrency: int = 1,
+    ):
+        """
+        Initialize handler supervisor
+
+        Args:
+            handler_id: Base identifier, workers get "<handler_id>-<n>"
+            processes: Number of worker processes
+            concurrency: Number of worker lanes inside each process
+        """
+        self.handler_id = handler_id
+        self.processes = max(1, processes)
+        self.concurrency = concurrency
+        self._context = multiprocessing.get_context("fork")
+        self._workers: list[Optional[multiprocessing.Process]] = [None] * self.processes
+        self._started_at: list[float] = [0.0] * self.processes
+        self._running = False
+        self._restart_interval = 5  # seconds
+        self._shutdown_timeout = 15  # seconds
+
+    def worker_id(self, index: int) -> str:
+        """
+        Derive unique handler id for worker slot
+
+        Args:
+            index: Worker slot index
+
+        Returns:
+            Handler id used as MQTT client identifier suffix
+        """
+        return f"{self.handler_id}-{index + 1}"
+
+    def start_worker(self, index: int):
+        """
+        Fork worker process for slot
+
+        Args:
+            index: Worker slot index
+        """
+        # Forked children must not share the parent's DB sockets
+        db.connections.close_all()
+
+        worker_id = self.worker_id(index)
+        process = self._context.Process(
+            target=handler_worker,
+            args=(worker_id, self.concurrency),
+            name=f"mqtt-handler-{worker_id}",
+            daemon=False,
+        )
+        process.start()
+        self._workers[index] = process
+        self._started_at[index] = time.monotonic()
+        logger.info(f"Supervisor: Started handler {worker_id} (pid={process.pid})")
+
+    def check_workers(self):
+        """
+        Restart dead workers, waiting restart interval for ones that crash fast
+        """
+        for index, process in enumerate(self._workers):
+            if process is not None and process.is_alive():
+                continue
+
+            if process is not None:
+                logger.error(
+                    f"Supervisor: Handler {self.worker_id(index)} exited "
+                    f"with code {process.exitcode}"
+                )
+                process.close()
+                self._workers[index] = None
+
+            if time.monotonic() - self._started_at[index] < self._restart_interval:
+                continue
+            self.start_worker(index)
+
+    def stop(self, *args):
+        """Request shutdown (usable as signal handler)"""
+        self._running = False
+
+    def shutdown(self):
+        """
+        Stop all workers gracefully, killing ones that don't exit in time
+        """
+        alive = [p for p in self._workers if p is not None and p.is_alive()]
+        logger.info(f"Supervisor: Stopping {len(alive)} handler processes")
+        for process in alive:
+            process.terminate()
+
+        deadline = time.monotonic() + self._shutdown_timeout
+        for process in alive:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning(
+                    f"Supervisor: {process.name} did not stop in "
+                    f"{self._shutdown_timeout}s, killing"
+                )
+                process.kill()
+                process.join()
+
+    def run(self):
+        """
+        Start workers and supervise them until SIGTERM/SIGINT
+        """
+        self._running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        for index in range(self.processes):
+            self.start_worker(index)
+
+        try:
+            while self._running:
+                time.sleep(1)
+                if self._running:
+                    self.check_workers()
+        finally:
+            self.shutdown()
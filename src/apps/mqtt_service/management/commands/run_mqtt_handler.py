@@ -1,6 +1,7 @@
 """
 Django management command to run MQTT handler
 Usage: python manage.py run_mqtt_handler [--handler-id HANDLER_ID]
+       [--concurrency CONCURRENCY] [--processes PROCESSES]
 """
 
 import asyncio
@@ -8,8 +9,7 @@ import logging
 import os
 from django.core.management.base import BaseCommand
 
-from apps.mqtt_service.handler_client import MQTTHandlerClient
-from apps.mqtt_service.mqtt_handlers import MessageHandler
+from apps.mqtt_service.handler_supervisor import HandlerSupervisor, run_handler
 
 logger = logging.getLogger(__name__)
 
@@ -24,9 +24,29 @@ class Command(BaseCommand):
             default=os.environ.get("MQTT_HANDLER_ID", "handler_1"),
             help="Unique identifier for this handler instance (default: handler_1)",
         )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=int(os.environ.get("MQTT_HANDLER_CONCURRENCY", 1)),
+            help=(
+                "Number of worker lanes processing messages in parallel, "
+                "ordered per device (default: 1)"
+            ),
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=int(os.environ.get("MQTT_HANDLER_PROCESSES", 1)),
+            help=(
+                "Number of supervised handler processes sharing the subscription, "
+                "each with id <handler-id>-<n> (default: 1)"
+            ),
+        )
 
     def handle(self, *args, **options):
         handler_id = options["handler_id"]
+        concurrency = options["concurrency"]
+        processes = options["processes"]
 
         # Configure logging
         logging.basicConfig(
@@ -34,10 +54,17 @@ class Command(BaseCommand):
             format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
         )
 
-        self.stdout.write(self.style.SUCCESS(f"Starting MQTT handler: {handler_id}"))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Starting MQTT handler: {handler_id} (processes={processes})"
+            )
+        )
 
         try:
-            asyncio.run(self.run_mqtt_handler(handler_id))
+            if processes > 1:
+                HandlerSupervisor(handler_id, processes, concurrency).run()
+            else:
+                asyncio.run(run_handler(handler_id, concurrency))
         except KeyboardInterrupt:
             self.stdout.write(
                 self.style.WARNING(f"MQTT handler {handler_id} stopped by user")
@@ -48,22 +75,3 @@ class Command(BaseCommand):
             )
             logger.error(f"MQTT handler error: {e}", exc_info=True)
             raise
-
-    async def run_mqtt_handler(self, handler_id: str):
-        """
-        Run MQTT handler with message processor
-
-        Args:
-            handler_id: Unique identifier for this handler instance
-        """
-        # Initialize message handler
-        handler = MessageHandler()
-
-        # Initialize MQTT handler client
-        client = MQTTHandlerClient(
-            message_handler=handler.handle_message,
-            handler_id=handler_id,
-        )
-
-        # Run client (with auto-reconnect)
-        await client.run()
@@ -1,6 +1,7 @@
 """
 Django management command to run MQTT Publisher service
 Usage: python manage.py run_mqtt_publisher [--publisher-id PUBLISHER_ID]
+       [--batch-size BATCH_SIZE] [--max-inflight MAX_INFLIGHT]
 """
 
 import asyncio
@@ -8,6 +9,7 @@ import logging
 import os
 from django.core.management.base import BaseCommand
 
+from apps.main.async_redis import close_async_redis
 from apps.mqtt_service.publisher_client import MQTTPublisherClient
 
 logger = logging.getLogger(__name__)
@@ -16,6 +18,12 @@ logger = logging.getLogger(__name__)
 class Command(BaseCommand):
     help = "Run MQTT Publisher service"
 
+    async def run_publisher(self, publisher: MQTTPublisherClient):
+        try:
+            await publisher.run()
+        finally:
+            await close_async_redis()
+
     def add_arguments(self, parser):
         parser.add_argument(
             "--publisher-id",
@@ -23,9 +31,23 @@ class Command(BaseCommand):
             default=os.environ.get("MQTT_PUBLISHER_ID", "publisher_1"),
             help="Unique identifier for this publisher instance (default: publisher_1)",
         )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=int(os.environ.get("MQTT_PUBLISHER_BATCH_SIZE", 1)),
+            help="Max messages drained from the queue per Redis call (default: 1)",
+        )
+        parser.add_argument(
+            "--max-inflight",
+            type=int,
+            default=int(os.environ.get("MQTT_PUBLISHER_MAX_INFLIGHT", 1)),
+            help="Max concurrent publishes awaiting broker ack (default: 1)",
+        )
 
     def handle(self, *args, **options):
         publisher_id = options["publisher_id"]
+        batch_size = options["batch_size"]
+        max_inflight = options["max_inflight"]
 
         logging.basicConfig(
             level=logging.INFO,
@@ -33,12 +55,19 @@ class Command(BaseCommand):
         )
 
         self.stdout.write(
-            self.style.SUCCESS(f"Starting MQTT Publisher: {publisher_id}")
+            self.style.SUCCESS(
+                f"Starting MQTT Publisher: {publisher_id} "
+                f"(batch_size={batch_size}, max_inflight={max_inflight})"
+            )
         )
 
         try:
-            publisher = MQTTPublisherClient(publisher_id=publisher_id)
-            asyncio.run(publisher.run())
+            publisher = MQTTPublisherClient(
+                publisher_id=publisher_id,
+                batch_size=batch_size,
+                max_inflight=max_inflight,
+            )
+            asyncio.run(self.run_publisher(publisher))
         except KeyboardInterrupt:
             self.stdout.write(
                 self.style.WARNING(f"MQTT Publisher {publisher_id} stopped by user")
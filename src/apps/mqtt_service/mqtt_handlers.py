@@ -2,14 +2,89 @@
 MQTT Message Handler
 """
 
-import json
 import logging
 from typing import Any
 from channels.layers import get_channel_layer
 
+from apps.devices import presence
+from apps.devices.ingestion import telemetry_ingestor
+from apps.main import json_codec
+from apps.mqtt_service.commands import device_commands
+from apps.mqtt_service.router import router
+from apps.mqtt_service.ws_bridge import ws_bridge
+
 logger = logging.getLogger(__name__)
 
 
+@router.route("from_device/+/status")
+async def device_status(topic: str, data: Any, username: str):
+    """
+    Device status message
+
+    Args:
+        topic: MQTT topic
+        data: Decoded payload
+        username: Device username from topic
+    """
+    logger.debug(f"MQTT: {username} status -> {data}")
+    ws_bridge.add("status", username, data)
+    await telemetry_ingestor.add("status", username, data)
+
+
+@router.route("from_device/+/event")
+async def device_event(topic: str, data: Any, username: str):
+    """
+    Device event message, {"reply_to": ...} events are command replies
+
+    Args:
+        topic: MQTT topic
+        data: Decoded payload
+        username: Device username from topic
+    """
+    logger.debug(f"MQTT: {username} event -> {data}")
+    if isinstance(data, dict) and "reply_to" in data:
+        await device_commands.handle_reply(username, data)
+    ws_bridge.add("event", username, data)
+    await telemetry_ingestor.add("event", username, data)
+
+
+@router.route("$SYS/brokers/+/clients/+/connected")
+async def client_connected(topic: str, data: Any, node: str, clientid: str):
+    """
+    EMQX client connected event, marks device online
+
+    Args:
+        topic: MQTT topic
+        data: Event payload (username, clientid, ts, ...)
+        node: EMQX node name
+        clientid: MQTT client id
+    """
+    if isinstance(data, dict):
+        await presence.handle_client_event(data, online=True)
+
+
+@router.route("$SYS/brokers/+/clients/+/disconnected")
+async def client_disconnected(topic: str, data: Any, node: str, clientid: str):
+    """
+    EMQX client disconnected event, marks device offline
+
+    Args:
+        topic: MQTT topic
+        data: Event payload (username, clientid, reason, ts, ...)
+        node: EMQX node name
+        clientid: MQTT client id
+    """
+    if isinstance(data, dict):
+        await presence.handle_client_event(data, online=False)
+
+
+# Add your routes here:
+#
+# @router.route("from_device/+/telemetry/+")
+# async def device_telemetry(topic: str, data: Any, username: str, sensor: str):
+#     ...
+
+
 class MessageHandler:
     """
     MQTT message handler with Django ORM and WebSocket support
@@ -17,26 +92,40 @@ class MessageHandler:
 
     def __init__(self):
         self.channel_layer = get_channel_layer()
+        self.router = router
+        self.ingestor = telemetry_ingestor
+        self.bridge = ws_bridge
 
-    async def handle_message(self, topic: str, payload: str, message: Any):
+    async def start(self):
+        """Start background stages (call inside the handler event loop)"""
+        await self.ingestor.start()
+        await self.bridge.start()
+
+    async def stop(self):
+        """Flush background stages before shutdown"""
+        await self.bridge.stop()
+        await self.ingestor.stop()
+
+    async def handle_message(self, topic: str, payload: bytes, message: Any):
         """
         Main message handler
 
         Args:
             topic: MQTT topic
-            payload: Message payload
+            payload: Raw message payload
             message: MQTT message object
         """
         try:
             try:
-                data = json.loads(payload)
-            except json.JSONDecodeError:
+                data = json_codec.loads(payload)
+            except json_codec.JSONDecodeError:
+                if isinstance(payload, (bytes, bytearray)):
+                    payload = payload.decode(errors="replace")
                 logger.warning(f"Non-JSON payload on '{topic}': {payload}")
                 data = {"raw": payload}
 
-            logger.info(f"MQTT: {topic} -> {data}")
-
-            # TODO: Add your routing logic here
+            if not await self.router.dispatch(topic, data):
+                logger.warning(f"MQTT: No route for '{topic}' -> {data}")
 
         except Exception as e:
             logger.error(
@@ -4,33 +4,122 @@ Similar to WebSocket sender pattern for consistency
 """
 
 import logging
-import json
-from typing import Any
+from typing import Any, Iterable, Optional
 
 from django.core.cache import cache
 
-logger = logging.getLogger(__name__)
+from apps.main.async_redis import get_async_redis
+from apps.mqtt_service.envelope import encode_envelope
+from apps.mqtt_service.publish_queue import (
+    KEY_PREFIX,
+    async_enqueue_items,
+    enqueue_items,
+    enqueue_script,
+    lane_of,
+)
 
-# Import QUEUE_KEY from publisher client
-from apps.mqtt_service.publisher_client import MQTTPublisherClient
+logger = logging.getLogger(__name__)
 
 
 class MQTTPublisherInterface:
     """Interface for publishing MQTT messages from Django via Redis queue"""
 
-    QUEUE_KEY = MQTTPublisherClient.QUEUE_KEY
+    def encode_message(
+        self,
+        topic: str,
+        payload: Any,
+        qos: int = 1,
+        retain: bool = False,
+        priority: str = "normal",
+        coalesce: Optional[bool] = None,
+        command_id: Optional[str] = None,
+    ) -> bytes:
+        """
+        Build queue item for a single MQTT message
+
+        Args:
+            topic: MQTT topic
+            payload: Message payload (bytes, str, dict, list)
+            qos: Quality of Service level (0, 1, 2)
+            retain: Whether to retain the message
+            priority: Queue lane: "high", "normal" or "low"
+            coalesce: Replace pending message of the same topic instead of
+                queueing another one (default: same as retain)
+            command_id: Device command correlation id (publisher marks it sent)
+
+        Returns:
+            bytes: Serialized queue item (compact envelope)
+
+        Raises:
+            ValueError: If priority is unknown (EnvelopeError for invalid
+                topic/QoS)
+        """
+        return encode_envelope(
+            topic,
+            payload,
+            qos,
+            retain,
+            command_id,
+            lane=lane_of(priority),
+            coalesce=retain if coalesce is None else coalesce,
+        )
+
+    def encode_messages(self, messages: Iterable[dict]) -> list[bytes]:
+        """
+        Serialize a batch of messages in a single pass, skipping invalid ones
+
+        Args:
+            messages: Dicts with "topic", "payload" and optional "qos", "retain",
+                "priority", "coalesce", "command_id"
+
+        Returns:
+            list[bytes]: Serialized queue items
+        """
+        items = []
+        for message in messages:
+            try:
+                items.append(
+                    self.encode_message(
+                        message["topic"],
+                        message.get("payload", ""),
+                        message.get("qos", 1),
+                        message.get("retain", False),
+                        message.get("priority", "normal"),
+                        message.get("coalesce"),
+                        message.get("command_id"),
+                    )
+                )
+            except Exception as e:
+                logger.error(f"Skipping invalid MQTT message {message!r}: {e}")
+        return items
 
     def publish(
-        self, topic: str, payload: Any, qos: int = 1, retain: bool = False
+        self,
+        topic: str,
+        payload: Any,
+        qos: int = 1,
+        retain: bool = False,
+        priority: str = "normal",
+        coalesce: Optional[bool] = None,
+        command_id: Optional[str] = None,
     ) -> bool:
         """
         Queue MQTT message for publishing (sync context)
 
+        Messages of one topic are published in order within their priority,
+        "high" messages overtake "normal" and "low" ones. A coalesced message
+        (retained state by default) replaces the payload of a still pending
+        one of the same topic and priority instead of being sent after it.
+
         Args:
             topic: MQTT topic
-            payload: Message payload (str, dict, list)
+            payload: Message payload (bytes, str, dict, list)
             qos: Quality of Service level (0, 1, 2)
             retain: Whether to retain the message
+            priority: Queue lane: "high", "normal" or "low"
+            coalesce: Keep only the latest pending payload of the topic
+                (default: same as retain)
+            command_id: Device command correlation id (publisher marks it sent)
 
         Returns:
             bool: True if queued successfully
@@ -38,19 +127,13 @@ class MQTTPublisherInterface:
         Usage:
             from apps.mqtt_service.mqtt_publisher import mqtt_publisher
             mqtt_publisher.publish("device/001/cmd", {"action": "start"}, qos=1)
+            mqtt_publisher.publish("device/001/cmd", {"cmd": "stop"}, priority="high")
         """
         try:
-            if isinstance(payload, (dict, list)):
-                payload = json.dumps(payload)
-
-            message = {
-                "topic": topic,
-                "payload": str(payload),
-                "qos": qos,
-                "retain": retain,
-            }
-
-            cache.client.get_client().rpush(self.QUEUE_KEY, json.dumps(message))
+            item = self.encode_message(
+                topic, payload, qos, retain, priority, coalesce, command_id
+            )
+            enqueue_script(cache.client.get_client(), args=[KEY_PREFIX, item])
             logger.debug(f"Queued MQTT publish: {topic}")
             return True
 
@@ -58,8 +141,47 @@ class MQTTPublisherInterface:
             logger.error(f"Failed to queue MQTT publish: {e}", exc_info=True)
             return False
 
+    def publish_many(self, messages: Iterable[dict]) -> int:
+        """
+        Queue a batch of MQTT messages in one pipelined round-trip (sync context)
+
+        Args:
+            messages: Dicts with "topic", "payload" and optional "qos", "retain"
+
+        Returns:
+            int: Number of messages queued
+
+        Usage:
+            from apps.mqtt_service.mqtt_publisher import mqtt_publisher
+            mqtt_publisher.publish_many(
+                {"topic": f"to_device/{username}", "payload": {"cmd": "reboot"}}
+                for username in usernames
+            )
+        """
+        items = self.encode_messages(messages)
+        if not items:
+            return 0
+
+        try:
+            pipe = cache.client.get_client().pipeline(transaction=False)
+            enqueue_items(pipe, items)
+            pipe.execute()
+            logger.debug(f"Queued {len(items)} MQTT publishes")
+            return len(items)
+
+        except Exception as e:
+            logger.error(f"Failed to queue MQTT publish batch: {e}", exc_info=True)
+            return 0
+
     async def publish_async(
-        self, topic: str, payload: Any, qos: int = 1, retain: bool = False
+        self,
+        topic: str,
+        payload: Any,
+        qos: int = 1,
+        retain: bool = False,
+        priority: str = "normal",
+        coalesce: Optional[bool] = None,
+        command_id: Optional[str] = None,
     ) -> bool:
         """
         Queue MQTT message for publishing (async context)
@@ -68,7 +190,46 @@ class MQTTPublisherInterface:
             from apps.mqtt_service.mqtt_publisher import mqtt_publisher
             await mqtt_publisher.publish_async("device/001/cmd", {"action": "start"})
         """
-        return self.publish(topic, payload, qos, retain)
+        queued = await self.publish_many_async(
+            [
+                {
+                    "topic": topic,
+                    "payload": payload,
+                    "qos": qos,
+                    "retain": retain,
+                    "priority": priority,
+                    "coalesce": coalesce,
+                    "command_id": command_id,
+                }
+            ]
+        )
+        return queued == 1
+
+    async def publish_many_async(self, messages: Iterable[dict]) -> int:
+        """
+        Queue a batch of MQTT messages in one pipelined round-trip (async context)
+
+        Returns:
+            int: Number of messages queued
+
+        Usage:
+            from apps.mqtt_service.mqtt_publisher import mqtt_publisher
+            await mqtt_publisher.publish_many_async(messages)
+        """
+        items = self.encode_messages(messages)
+        if not items:
+            return 0
+
+        try:
+            pipe = get_async_redis().pipeline(transaction=False)
+            await async_enqueue_items(pipe, items)
+            await pipe.execute()
+            logger.debug(f"Queued {len(items)} MQTT publishes")
+            return len(items)
+
+        except Exception as e:
+            logger.error(f"Failed to queue MQTT publish batch: {e}", exc_info=True)
+            return 0
 
 
 # Singleton instance
@@ -0,0 +1,680 @@
+"""
+Reliable MQTT publish queue
+At-least-once, prioritized publish queue shared by several publishers
+
+Every topic (to_device/<username>) has its own sub-queue per priority lane.
+A publisher claims a ready sub-queue, so messages of one topic are published
+by one publisher at a time and in order, while different topics are
+published in parallel. Lanes are drained by weighted round-robin
+(MQTT_PUBLISH_LANE_WEIGHTS), so a big low priority broadcast doesn't hold
+back urgent commands and isn't starved either. Coalesced messages (retained
+state by default) replace the pending payload of their topic, so each topic
+goes out at most once per drain.
+
+Downlink rate is shaped by token buckets kept in Redis, so all publishers
+share one budget: global, per topic prefix and per topic (device). A topic
+over budget is deferred until its bucket refills, its messages stay queued
+in order.
+
+Taken items sit in the publisher's own processing list and are removed only
+after the broker PUBACK. Failed publishes are retried with exponential
+backoff through a delayed set and end up in a dead-letter list after
+MQTT_PUBLISH_MAX_ATTEMPTS. Processing lists and claims of publishers whose
+heartbeat expired are moved back by the remaining publishers.
+
+The guarantee holds only if Redis never evicts these keys: they have no
+TTL, so maxmemory-policy must be noeviction or volatile-* (compose uses
+volatile-lru). With allkeys-* policies queued messages can silently
+disappear under memory pressure.
+
+Keys:
+    mqtt:publish_queue:lane:<lane>:<topic>   pending items of topic
+    mqtt:publish_queue:latest                pending payload of coalesced topics
+    mqtt:publish_queue:ready:<lane>          "<lane>:<topic>" with pending items
+    mqtt:publish_queue:claimed               "<lane>:<topic>" being published
+    mqtt:publish_queue:claimed:<id>          claims of a publisher
+    mqtt:publish_queue:wake                  tokens waking idle publishers
+    mqtt:publish_queue:deferred              "<lane>:<topic>" over rate limit
+                                             (score = due time)
+    mqtt:publish_queue:deferred:seq          sequence of deferred members
+    mqtt:publish_queue:rate:<bucket>         token bucket (global,
+                                             prefix:<prefix>, topic:<topic>)
+    mqtt:publish_queue:processing:<id>       items being published
+    mqtt:publish_queue:retry                 delayed retries (score = due time)
+    mqtt:publish_queue:dead                  items that can't be published
+    mqtt:publish_queue                       items of older producers (moved
+                                             into lanes by publishers)
+    mqtt:publishers                          publisher ids with processing lists
+    mqtt:publishers:<id>                     heartbeat (expires when dead)
+"""
+
+import json
+import logging
+import time
+
+from django.conf import settings
+
+from apps.main.lua_script import LuaScript
+from apps.mqtt_service.envelope import DEFAULT_LANE
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = "mqtt:publish_queue"
+KEY_PREFIX = f"{QUEUE_KEY}:"
+PROCESSING_KEY_PREFIX = f"{KEY_PREFIX}processing:"
+CLAIMED_KEY_PREFIX = f"{KEY_PREFIX}claimed:"
+WAKE_KEY = f"{KEY_PREFIX}wake"
+RETRY_KEY = f"{KEY_PREFIX}retry"
+RETRY_SEQ_KEY = f"{KEY_PREFIX}retry:seq"
+DEAD_LETTER_KEY = f"{KEY_PREFIX}dead"
+PUBLISHERS_KEY = "mqtt:publishers"
+HEARTBEAT_KEY_PREFIX = "mqtt:publishers:"
+
+# Priority name -> lane (lower lane is drained first)
+PRIORITIES = {"high": 0, "normal": DEFAULT_LANE, "low": 2}
+
+# Shortest wait for a deferred topic (BLPOP timeout 0 blocks forever)
+MIN_DEFER_WAIT = 0.01
+
+# Max items per enqueue call
+ENQUEUE_CHUNK_SIZE = 1000
+
+# Max retries / older producer items moved into lanes per call
+PROMOTE_LIMIT = 1000
+
+# Shared by all scripts, ARGV[1] is always KEY_PREFIX
+LUA_HELPERS = """
+local prefix = ARGV[1]
+
+-- "<lane>:<topic>" of compact or legacy JSON item, nil if it can't be read
+local function queue_name(item)
+    if string.byte(item, 1) == 123 then
+        local ok, message = pcall(cjson.decode, item)
+        if ok and type(message) == 'table' and type(message.topic) == 'string' then
+            return '1:' .. message.topic
+        end
+        return nil
+    end
+    if string.byte(item, 1) ~= 1 or #item < 4 then
+        return nil
+    end
+    local flags = string.byte(item, 2)
+    local topic_length = string.byte(item, 3) * 256 + string.byte(item, 4)
+    return string.format('%d', math.floor(flags / 32) % 4) .. ':'
+        .. string.sub(item, 5, 4 + topic_length)
+end
+
+local function mark_ready(name)
+    redis.call('RPUSH', prefix .. 'ready:' .. string.match(name, '^%d+'), name)
+    redis.call('LPUSH', prefix .. 'wake', 1)
+    redis.call('LTRIM', prefix .. 'wake', 0, 99)
+end
+
+local function push(name, value)
+    local length = redis.call('RPUSH', prefix .. 'lane:' .. name, value)
+    if length == 1 and redis.call('SISMEMBER', prefix .. 'claimed', name) == 0 then
+        mark_ready(name)
+    end
+end
+
+-- Pending payload of a coalesced topic lives in the 'latest' hash, its topic
+-- queue only holds a placeholder at the position of the first update
+local PLACEHOLDER = string.char(0)
+
+local function coalesced(item)
+    return string.byte(item, 1) == 1 and string.byte(item, 2) >= 128
+end
+
+-- keep_newer: don't replace a pending payload (retried items are older)
+local function enqueue(item, keep_newer)
+    local name = queue_name(item)
+    if not name then
+        redis.call('RPUSH', prefix .. 'dead', item)
+        return
+    end
+    if not coalesced(item) then
+        push(name, item)
+        return
+    end
+    local added
+    if keep_newer then
+        added = redis.call('HSETNX', prefix .. 'latest', name, item)
+    else
+        added = redis.call('HSET', prefix .. 'latest', name, item)
+    end
+    if added == 1 then
+        push(name, PLACEHOLDER)
+    end
+end
+
+local function release(name)
+    redis.call('SREM', prefix .. 'claimed', name)
+    if redis.call('EXISTS', prefix .. 'lane:' .. name) == 1 then
+        mark_ready(name)
+    end
+end
+"""
+
+# ARGV[2..] items
+ENQUEUE_SCRIPT = (
+    LUA_HELPERS
+    + """
+for i = 2, #ARGV do
+    enqueue(ARGV[i])
+end
+return #ARGV - 1
+"""
+)
+
+# KEYS[1] processing list, KEYS[2] own claims
+# ARGV[2] max items, ARGV[3] max items per topic, ARGV[4] rate limits JSON
+# ('' if none), ARGV[5..] lanes in drain order
+# Ready entries of topics claimed by others are dropped, the owner marks
+# the topic ready again when it releases it. Deferred members are prefixed
+# with a sequence number like retries, so topics waiting for the same shared
+# bucket are served in turn. Returns taken items and, if
+# there are none, milliseconds until a deferred topic is due (0 if none)
+FETCH_SCRIPT = (
+    LUA_HELPERS
+    + """
+local budget = tonumber(ARGV[2])
+local per_topic = tonumber(ARGV[3])
+local limits = ARGV[4] ~= '' and cjson.decode(ARGV[4]) or nil
+local deferred = prefix .. 'deferred'
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local due = redis.call('ZRANGEBYSCORE', deferred, '-inf', now, 'LIMIT', 0, 100)
+for _, member in ipairs(due) do
+    local name = string.sub(member, 17)
+    redis.call('RPUSH', prefix .. 'ready:' .. string.match(name, '^%d+'), name)
+end
+if #due > 0 then
+    redis.call('ZREM', deferred, unpack(due))
+end
+
+-- Token buckets refill at rate/s up to burst, a missing key is a full bucket.
+-- Loaded once per call, so topics sharing a bucket see each other's spending
+local loaded = {}
+local function bucket(key, rate, burst)
+    if not loaded[key] then
+        local state = redis.call('HMGET', key, 'tokens', 'ts')
+        local tokens = tonumber(state[1])
+        if tokens then
+            tokens = math.min(burst, tokens + math.max(0, now - tonumber(state[2])) * rate)
+        else
+            tokens = burst
+        end
+        loaded[key] = {key = key, rate = rate, burst = burst, tokens = tokens}
+    end
+    return loaded[key]
+end
+
+local function spend(b, count)
+    b.tokens = b.tokens - count
+    redis.call('HSET', b.key, 'tokens', b.tokens, 'ts', now)
+    redis.call('PEXPIRE', b.key, math.ceil((b.burst - b.tokens) / b.rate * 1000) + 1000)
+end
+
+-- Buckets limiting topic, the global one first
+local function buckets_of(topic)
+    local result = {}
+    if limits.global then
+        result[#result + 1] = bucket(prefix .. 'rate:global', limits.global[1], limits.global[2])
+    end
+    for _, limit in ipairs(limits.prefixes or {}) do
+        if string.sub(topic, 1, #limit[1]) == limit[1] then
+            result[#result + 1] = bucket(prefix .. 'rate:prefix:' .. limit[1], limit[2], limit[3])
+        end
+    end
+    if limits.topic then
+        result[#result + 1] = bucket(prefix .. 'rate:topic:' .. topic, limits.topic[1], limits.topic[2])
+    end
+    return result
+end
+
+local items = {}
+local global_wait = nil
+for i = 5, #ARGV do
+    local ready = prefix .. 'ready:' .. ARGV[i]
+    while budget > 0 do
+        local name = redis.call('LPOP', ready)
+        if not name then
+            break
+        end
+        if redis.call('SADD', prefix .. 'claimed', name) == 1 then
+            redis.call('SADD', KEYS[2], name)
+            local queue = prefix .. 'lane:' .. name
+            local allowed = math.min(per_topic, budget)
+            local limited = {}
+            if limits then
+                limited = buckets_of(string.match(name, '^%d+:(.*)$'))
+                allowed = math.min(allowed, redis.call('LLEN', queue))
+                for _, b in ipairs(limited) do
+                    allowed = math.min(allowed, math.floor(b.tokens))
+                end
+            end
+            local taken = 0
+            for j = 1, allowed do
+                local item = redis.call('LPOP', queue)
+                if not item then
+                    break
+                end
+                if item == PLACEHOLDER then
+                    item = redis.call('HGET', prefix .. 'latest', name)
+                    redis.call('HDEL', prefix .. 'latest', name)
+                end
+                if item then
+                    redis.call('RPUSH', KEYS[1], item)
+                    items[#items + 1] = item
+                    taken = taken + 1
+                end
+            end
+            budget = budget - taken
+            if taken > 0 then
+                for _, b in ipairs(limited) do
+                    spend(b, taken)
+                end
+            else
+                -- Stale entry of an already drained topic or over budget
+                redis.call('SREM', prefix .. 'claimed', name)
+                redis.call('SREM', KEYS[2], name)
+                if allowed == 0 and redis.call('EXISTS', queue) == 1 then
+                    local wait = 0
+                    for _, b in ipairs(limited) do
+                        if b.tokens < 1 then
+                            wait = math.max(wait, (1 - b.tokens) / b.rate)
+                        end
+                    end
+                    if limits.global and limited[1].tokens < 1 then
+                        -- Nothing can go out, the topic keeps its turn
+                        redis.call('LPUSH', ready, name)
+                        global_wait = wait
+                        budget = 0
+                    else
+                        local seq = redis.call('INCR', deferred .. ':seq')
+                        redis.call('ZADD', deferred, math.ceil((now + wait) * 1000) / 1000,
+                            string.format('%016x', seq) .. name)
+                    end
+                end
+            end
+        end
+    end
+end
+
+local wait = 0
+if #items == 0 then
+    local next_due = redis.call('ZRANGE', deferred, 0, 0, 'WITHSCORES')
+    if next_due[2] then
+        wait = math.max(0, tonumber(next_due[2]) - now)
+    end
+    if global_wait and (wait == 0 or global_wait < wait) then
+        wait = global_wait
+    end
+end
+return {items, math.ceil(wait * 1000)}
+"""
+)
+
+# KEYS[1] own claims
+RELEASE_SCRIPT = (
+    LUA_HELPERS
+    + """
+for _, name in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+    release(name)
+end
+redis.call('DEL', KEYS[1])
+"""
+)
+
+# KEYS[1] processing list, KEYS[2] retry set, KEYS[3] sequence
+# ARGV[1] item, ARGV[2] item with increased attempts, ARGV[3] due time
+# Members are prefixed with a sequence number (16 hex chars), so identical
+# items don't collapse into one
+RETRY_SCRIPT = """
+if redis.call('LREM', KEYS[1], 1, ARGV[1]) == 0 then
+    return 0
+end
+local seq = redis.call('INCR', KEYS[3])
+redis.call('ZADD', KEYS[2], ARGV[3], string.format('%016x', seq) .. ARGV[2])
+return 1
+"""
+
+# KEYS[1] processing list, KEYS[2] dead-letter list; ARGV[1] item, ARGV[2] max size
+DEAD_LETTER_SCRIPT = """
+if redis.call('LREM', KEYS[1], 1, ARGV[1]) == 0 then
+    return 0
+end
+redis.call('RPUSH', KEYS[2], ARGV[1])
+redis.call('LTRIM', KEYS[2], -tonumber(ARGV[2]), -1)
+return 1
+"""
+
+# KEYS[1] retry set, KEYS[2] older producers queue; ARGV[2] now, ARGV[3] limit
+PROMOTE_SCRIPT = (
+    LUA_HELPERS
+    + """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[2], 'LIMIT', 0, ARGV[3])
+for _, member in ipairs(due) do
+    enqueue(string.sub(member, 17), true)
+end
+if #due > 0 then
+    redis.call('ZREM', KEYS[1], unpack(due))
+end
+local legacy = redis.call('LPOP', KEYS[2], ARGV[3]) or {}
+for _, item in ipairs(legacy) do
+    enqueue(item)
+end
+return #due + #legacy
+"""
+)
+
+# KEYS[1] processing list, KEYS[2] claims of its publisher
+# Items go back to the head of their topic queues in the original order
+# (coalesced ones only if no newer payload is pending), then the claimed
+# topics are released
+REQUEUE_SCRIPT = (
+    LUA_HELPERS
+    + """
+local items = redis.call('LRANGE', KEYS[1], 0, -1)
+for i = #items, 1, -1 do
+    local name = queue_name(items[i])
+    if not name then
+        redis.call('RPUSH', prefix .. 'dead', items[i])
+    elseif coalesced(items[i])
+            and redis.call('HEXISTS', prefix .. 'latest', name) == 1 then
+        -- Superseded by the pending payload
+    else
+        redis.call('LPUSH', prefix .. 'lane:' .. name, items[i])
+        if redis.call('SISMEMBER', prefix .. 'claimed', name) == 0 then
+            redis.call('SADD', KEYS[2], name)
+        end
+    end
+end
+redis.call('DEL', KEYS[1])
+for _, name in ipairs(redis.call('SMEMBERS', KEYS[2])) do
+    release(name)
+end
+redis.call('DEL', KEYS[2])
+return #items
+"""
+)
+
+
+enqueue_script = LuaScript(ENQUEUE_SCRIPT)
+fetch_script = LuaScript(FETCH_SCRIPT)
+release_script = LuaScript(RELEASE_SCRIPT)
+retry_script = LuaScript(RETRY_SCRIPT)
+dead_letter_script = LuaScript(DEAD_LETTER_SCRIPT)
+promote_script = LuaScript(PROMOTE_SCRIPT)
+requeue_script = LuaScript(REQUEUE_SCRIPT)
+
+
+def lane_of(priority: str) -> int:
+    """
+    Get lane of priority name
+
+    Raises:
+        ValueError: If priority is unknown
+    """
+    try:
+        return PRIORITIES[priority]
+    except KeyError:
+        raise ValueError(f"Unknown priority: {priority!r}") from None
+
+
+def lane_schedule(weights: dict[str, int]) -> list[list[int]]:
+    """
+    Smooth weighted round-robin of lanes
+
+    Args:
+        weights: Priority name -> weight
+
+    Returns:
+        One drain order per fetch (the scheduled lane first, then the others
+        by priority), sum(weights) entries in total
+    """
+    lanes = {lane_of(name): max(1, weight) for name, weight in weights.items()}
+    total = sum(lanes.values())
+    current = dict.fromkeys(lanes, 0)
+    schedule = []
+    for _ in range(total):
+        for lane, weight in lanes.items():
+            current[lane] += weight
+        first = max(sorted(current), key=current.get)
+        current[first] -= total
+        schedule.append([first] + [lane for lane in sorted(lanes) if lane != first])
+    return schedule
+
+
+def rate_limits() -> str:
+    """
+    Build FETCH_SCRIPT rate limits argument from settings
+
+    Returns:
+        JSON with [rate, burst] of enabled buckets, "" if no limit is set
+    """
+    limits = {}
+    if settings.MQTT_PUBLISH_GLOBAL_RATE > 0:
+        limits["global"] = [
+            settings.MQTT_PUBLISH_GLOBAL_RATE,
+            max(1, settings.MQTT_PUBLISH_GLOBAL_BURST),
+        ]
+    if settings.MQTT_PUBLISH_DEVICE_RATE > 0:
+        limits["topic"] = [
+            settings.MQTT_PUBLISH_DEVICE_RATE,
+            max(1, settings.MQTT_PUBLISH_DEVICE_BURST),
+        ]
+    prefixes = [
+        [prefix, rate, max(1, rate)]
+        for prefix, rate in settings.MQTT_PUBLISH_PREFIX_RATES.items()
+        if rate > 0
+    ]
+    if prefixes:
+        limits["prefixes"] = prefixes
+    return json.dumps(limits) if limits else ""
+
+
+def enqueue_items(pipe, items: list[bytes]):
+    """
+    Queue calls adding items to their topic queues on a sync pipeline
+
+    Args:
+        pipe: Redis pipeline
+        items: Serialized queue items (one call per ENQUEUE_CHUNK_SIZE)
+    """
+    for i in range(0, len(items), ENQUEUE_CHUNK_SIZE):
+        enqueue_script(pipe, args=[KEY_PREFIX, *items[i : i + ENQUEUE_CHUNK_SIZE]])
+
+
+async def async_enqueue_items(pipe, items: list[bytes]):
+    """Same as enqueue_items for an asyncio pipeline"""
+    for i in range(0, len(items), ENQUEUE_CHUNK_SIZE):
+        await enqueue_script(
+            pipe, args=[KEY_PREFIX, *items[i : i + ENQUEUE_CHUNK_SIZE]]
+        )
+
+
+class PublishQueue:
+    """Queue operations of one publisher (async Redis client)"""
+
+    def __init__(self, publisher_id: str):
+        """
+        Initialize queue of publisher
+
+        Args:
+            publisher_id: Unique publisher identifier (must be stable across
+                restarts, so a restarted publisher requeues its own items)
+        """
+        self.publisher_id = publisher_id
+        self.processing_key = f"{PROCESSING_KEY_PREFIX}{publisher_id}"
+        self.claimed_key = f"{CLAIMED_KEY_PREFIX}{publisher_id}"
+        self.heartbeat_key = f"{HEARTBEAT_KEY_PREFIX}{publisher_id}"
+        self.max_attempts = settings.MQTT_PUBLISH_MAX_ATTEMPTS
+        self.heartbeat_ttl = settings.MQTT_PUBLISHER_HEARTBEAT_TTL
+        self.topic_batch = settings.MQTT_PUBLISH_TOPIC_BATCH
+        self.schedule = lane_schedule(settings.MQTT_PUBLISH_LANE_WEIGHTS)
+        self.rate_limits = rate_limits()
+        self._turn = 0
+
+    async def take(self, redis, count: int) -> tuple[list[bytes], int]:
+        """
+        Claim ready topics and move up to count of their items to processing,
+        deferring topics over rate limit
+
+        Args:
+            redis: asyncio Redis client
+            count: Max items to take
+
+        Returns:
+            Raw queue items (in order within each topic) and, if there are
+            none, milliseconds until a deferred topic is due (0 if none)
+        """
+        lanes = self.schedule[self._turn % len(self.schedule)]
+        self._turn += 1
+        items, wait_ms = await fetch_script(
+            redis,
+            keys=[self.processing_key, self.claimed_key],
+            args=[KEY_PREFIX, count, self.topic_batch, self.rate_limits, *lanes],
+        )
+        return items, wait_ms
+
+    async def fetch(self, redis, count: int, timeout: float = 1) -> list[bytes]:
+        """
+        Take ready items, waiting for a wake token or a deferred topic when
+        there are none
+
+        Args:
+            redis: asyncio Redis client
+            count: Max items to take
+            timeout: Seconds to wait for new items
+
+        Returns:
+            Raw queue items (empty list if nothing became ready)
+        """
+        batch, wait_ms = await self.take(redis, count)
+        if batch:
+            return batch
+        if wait_ms:
+            timeout = min(timeout, max(wait_ms / 1000, MIN_DEFER_WAIT))
+        # BLPOP doesn't block the event loop, so aiomqtt keeps servicing
+        # keepalives and PUBACKs in the meantime
+        if await redis.blpop(WAKE_KEY, timeout=timeout) is None and not wait_ms:
+            return []
+        batch, _ = await self.take(redis, count)
+        return batch
+
+    async def ack(self, redis, items: list[bytes]):
+        """Remove published items from processing list"""
+        if not items:
+            return
+        pipe = redis.pipeline(transaction=False)
+        for item in items:
+            pipe.lrem(self.processing_key, 1, item)
+        await pipe.execute()
+
+    async def release(self, redis):
+        """Release claimed topics, the ones with pending items become ready"""
+        await release_script(redis, keys=[self.claimed_key], args=[KEY_PREFIX])
+
+    def retry_delay(self, attempts: int) -> float:
+        """Backoff before retry number attempts (1-based)"""
+        return min(
+            settings.MQTT_PUBLISH_RETRY_BASE_DELAY * 2 ** (attempts - 1),
+            settings.MQTT_PUBLISH_RETRY_MAX_DELAY,
+        )
+
+    async def retry(self, redis, item: bytes, retry_item: bytes, attempts: int):
+        """
+        Schedule failed item for another attempt
+
+        Args:
+            redis: asyncio Redis client
+            item: Item as it is in the processing list
+            retry_item: Item with increased attempts
+            attempts: Failed attempts including this one
+        """
+        await retry_script(
+            redis,
+            keys=[self.processing_key, RETRY_KEY, RETRY_SEQ_KEY],
+            args=[item, retry_item, time.time() + self.retry_delay(attempts)],
+        )
+
+    async def dead_letter(self, redis, item: bytes):
+        """Move item that can't be published to the dead-letter list"""
+        await dead_letter_script(
+            redis,
+            keys=[self.processing_key, DEAD_LETTER_KEY],
+            args=[item, settings.MQTT_PUBLISH_DEAD_LETTER_SIZE],
+        )
+
+    async def promote_retries(self, redis) -> int:
+        """Move due retries and items of older producers into topic queues"""
+        return await promote_script(
+            redis,
+            keys=[RETRY_KEY, QUEUE_KEY],
+            args=[KEY_PREFIX, time.time(), PROMOTE_LIMIT],
+        )
+
+    async def heartbeat(self, redis):
+        """Mark publisher alive"""
+        pipe = redis.pipeline(transaction=False)
+        pipe.set(self.heartbeat_key, 1, ex=self.heartbeat_ttl)
+        pipe.sadd(PUBLISHERS_KEY, self.publisher_id)
+        await pipe.execute()
+
+    async def requeue(self, redis, publisher_id: str) -> int:
+        """Move processing list and claims of publisher back to the queues"""
+        return await requeue_script(
+            redis,
+            keys=[
+                f"{PROCESSING_KEY_PREFIX}{publisher_id}",
+                f"{CLAIMED_KEY_PREFIX}{publisher_id}",
+            ],
+            args=[KEY_PREFIX],
+        )
+
+    async def requeue_own(self, redis) -> int:
+        """
+        Move items left in own processing list back to the queue (after
+        restart or broker reconnect, when nothing is in flight)
+        """
+        count = await self.requeue(redis, self.publisher_id)
+        if count:
+            logger.warning(
+                f"Publisher-{self.publisher_id}: Requeued {count} unacked messages"
+            )
+        return count
+
+    async def reclaim_stale(self, redis) -> int:
+        """
+        Requeue processing lists of publishers whose heartbeat expired
+
+        Returns:
+            int: Number of items moved back to the queue
+        """
+        total = 0
+        for publisher_id in await redis.smembers(PUBLISHERS_KEY):
+            publisher_id = publisher_id.decode()
+            if publisher_id == self.publisher_id:
+                continue
+            if await redis.exists(f"{HEARTBEAT_KEY_PREFIX}{publisher_id}"):
+                continue
+
+            count = await self.requeue(redis, publisher_id)
+            await redis.srem(PUBLISHERS_KEY, publisher_id)
+            if count:
+                logger.warning(
+                    f"Publisher-{self.publisher_id}: Reclaimed {count} messages "
+                    f"of stale publisher {publisher_id}"
+                )
+            total += count
+        return total
+
+    async def leave(self, redis):
+        """Requeue own items and drop heartbeat on graceful stop"""
+        await self.requeue_own(redis)
+        pipe = redis.pipeline(transaction=False)
+        pipe.delete(self.heartbeat_key)
+        pipe.srem(PUBLISHERS_KEY, self.publisher_id)
+        await pipe.execute()
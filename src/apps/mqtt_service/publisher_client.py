@@ -5,13 +5,17 @@ Similar to handler pattern for consistency
 """
 
 import asyncio
-import json
 import logging
+import time
 from typing import Optional
 
 import aiomqtt
 from django.conf import settings
-from django.core.cache import cache
+
+from apps.main.async_redis import get_async_redis
+from apps.mqtt_service.commands import device_commands
+from apps.mqtt_service.envelope import EnvelopeError, decode_envelope, retry_envelope
+from apps.mqtt_service.publish_queue import QUEUE_KEY, PublishQueue
 
 logger = logging.getLogger(__name__)
 
@@ -19,14 +23,29 @@ logger = logging.getLogger(__name__)
 class MQTTPublisherClient:
     """Persistent MQTT publisher client with queue-based publishing"""
 
-    QUEUE_KEY = "mqtt:publish_queue"
+    QUEUE_KEY = QUEUE_KEY
+    # Seconds between retry promotions (also moves items of older producers)
+    MAINTENANCE_INTERVAL = 1
+
+    def __init__(
+        self, publisher_id: str = "1", batch_size: int = 1, max_inflight: int = 1
+    ):
+        """
+        Initialize MQTT publisher client
 
-    def __init__(self, publisher_id: str = "1"):
+        Args:
+            publisher_id: Unique publisher identifier for logging
+            batch_size: Max messages drained from the queue per Redis call
+            max_inflight: Max concurrent QoS>0 publishes awaiting broker ack
+        """
         self.publisher_id = publisher_id
         self.broker_host = settings.MQTT_BROKER_HOST
         self.broker_port = settings.MQTT_BROKER_PORT
         self.username = settings.MQTT_USERNAME or None
         self.password = settings.MQTT_PASSWORD or None
+        self.batch_size = max(1, batch_size)
+        self.max_inflight = max(1, max_inflight)
+        self.queue = PublishQueue(publisher_id)
         self._client: Optional[aiomqtt.Client] = None
         self._reconnect_interval = 5
         self._running = False
@@ -41,41 +60,185 @@ class MQTTPublisherClient:
             identifier=f"publishers-{self.publisher_id}",
             keepalive=60,
             clean_session=True,
+            max_inflight_messages=self.max_inflight,
         )
 
-    async def publish_from_queue(self, client: aiomqtt.Client):
-        """Process messages from Redis queue and publish to MQTT"""
-        while self._running:
+    async def fetch_batch(self, redis) -> list[bytes]:
+        """
+        Take up to batch_size ready messages in one call, waiting if there
+        are none
+
+        Taken messages stay in this publisher's processing list until acked,
+        their topics stay claimed until the batch is done.
+
+        Args:
+            redis: asyncio Redis client
+
+        Returns:
+            Raw queued messages (empty list if queue stayed empty)
+        """
+        return await self.queue.fetch(redis, self.batch_size)
+
+    async def publish_message(self, client: aiomqtt.Client, item: bytes):
+        """
+        Decode queued message and publish it to MQTT broker
+
+        Args:
+            client: Connected MQTT client
+            item: Raw message from Redis queue (compact or legacy JSON envelope)
+        """
+        message = decode_envelope(item)
+
+        # Publish to MQTT broker (waits for PUBACK on QoS 1)
+        await client.publish(
+            message.topic, message.payload, qos=message.qos, retain=message.retain
+        )
+        logger.info(f"Publisher-{self.publisher_id}: Published to '{message.topic}'")
+
+        if message.command_id is not None:
             try:
-                # Get message from Redis queue (blocking with timeout)
-                message_data = cache.client.get_client().blpop(
-                    self.QUEUE_KEY, timeout=1
+                await device_commands.mark_sent_async(message.command_id)
+            except Exception as e:
+                # Message is already out, don't retry it because of this
+                logger.error(
+                    f"Publisher-{self.publisher_id}: Failed to mark command "
+                    f"{message.command_id} sent: {e}"
                 )
 
-                if not message_data:
-                    await asyncio.sleep(0.1)
-                    continue
+    async def handle_failure(self, redis, item: bytes, error: Exception):
+        """
+        Retry failed message with backoff or move it to the dead-letter list
+
+        Args:
+            redis: asyncio Redis client
+            item: Raw message from the processing list
+            error: Publish error
+        """
+        try:
+            message = decode_envelope(item)
+        except EnvelopeError as e:
+            logger.error(f"Publisher-{self.publisher_id}: Invalid queue item: {e}")
+            await self.queue.dead_letter(redis, item)
+            return
+
+        attempts = message.attempts + 1
+        if attempts >= self.queue.max_attempts:
+            logger.error(
+                f"Publisher-{self.publisher_id}: Giving up on '{message.topic}' "
+                f"after {attempts} attempts: {error}"
+            )
+            await self.queue.dead_letter(redis, item)
+            return
+
+        logger.warning(
+            f"Publisher-{self.publisher_id}: Publish to '{message.topic}' failed "
+            f"({error}), retry {attempts} in {self.queue.retry_delay(attempts)}s"
+        )
+        await self.queue.retry(redis, item, retry_envelope(message), attempts)
 
-                _, message_json = message_data
-                message = json.loads(message_json)
+    async def publish_batch(self, client: aiomqtt.Client, redis, batch: list[bytes]):
+        """
+        Publish taken messages concurrently within the in-flight window, then
+        ack published ones, retry failed ones and release their topics
 
-                topic = message.get("topic")
-                payload = message.get("payload", "")
-                qos = message.get("qos", 1)
-                retain = message.get("retain", False)
+        Messages of one topic are started in queue order, so they leave the
+        MQTT connection in order.
 
-                # Publish to MQTT broker
-                await client.publish(topic, str(payload), qos=qos, retain=retain)
-                logger.info(f"Publisher-{self.publisher_id}: Published to '{topic}'")
+        Args:
+            client: Connected MQTT client
+            redis: asyncio Redis client
+            batch: Raw messages from Redis queue
 
-            except json.JSONDecodeError as e:
-                logger.error(f"Publisher-{self.publisher_id}: Invalid JSON: {e}")
+        Raises:
+            aiomqtt.MqttError: If the connection failed, unpublished messages
+                stay in the processing list and are requeued on reconnect
+        """
+        inflight = asyncio.Semaphore(self.max_inflight)
+
+        async def publish_limited(item: bytes):
+            async with inflight:
+                await self.publish_message(client, item)
+
+        results = await asyncio.gather(
+            *(publish_limited(item) for item in batch),
+            return_exceptions=True,
+        )
+        await self.queue.ack(
+            redis, [item for item, result in zip(batch, results) if result is None]
+        )
+
+        failed = 0
+        connection_error = None
+        for item, result in zip(batch, results):
+            if result is None:
+                continue
+            failed += 1
+            if isinstance(result, aiomqtt.MqttError):
+                connection_error = result
+            else:
+                await self.handle_failure(redis, item, result)
+
+        logger.debug(
+            f"Publisher-{self.publisher_id}: Batch of {len(batch)} published "
+            f"({failed} failed)"
+        )
+        if connection_error is not None:
+            raise connection_error
+        # Next messages of these topics can go out only after this batch
+        await self.queue.release(redis)
+
+    async def maintain_queue(self, redis):
+        """Refresh heartbeat, promote due retries and reclaim stale publishers"""
+        last_heartbeat = last_reclaim = 0.0
+        while self._running:
+            try:
+                now = time.monotonic()
+                if now - last_heartbeat >= self.queue.heartbeat_ttl / 3:
+                    await self.queue.heartbeat(redis)
+                    last_heartbeat = now
+                if now - last_reclaim >= self.queue.heartbeat_ttl:
+                    await self.queue.reclaim_stale(redis)
+                    last_reclaim = now
+                await self.queue.promote_retries(redis)
             except Exception as e:
                 logger.error(
-                    f"Publisher-{self.publisher_id}: Error processing queue: {e}",
-                    exc_info=True,
+                    f"Publisher-{self.publisher_id}: Queue maintenance error: {e}"
                 )
-                await asyncio.sleep(1)
+            await asyncio.sleep(self.MAINTENANCE_INTERVAL)
+
+    async def publish_from_queue(self, client: aiomqtt.Client):
+        """Process messages from Redis queue and publish to MQTT"""
+        redis = get_async_redis()
+        # Nothing is in flight yet, so anything left in the processing list
+        # (crash, lost broker connection) goes back to the queue
+        await self.queue.requeue_own(redis)
+        await self.queue.heartbeat(redis)
+        maintenance = asyncio.create_task(self.maintain_queue(redis))
+
+        try:
+            while self._running:
+                try:
+                    batch = await self.fetch_batch(redis)
+                    if batch:
+                        await self.publish_batch(client, redis, batch)
+
+                except aiomqtt.MqttError:
+                    raise
+                except Exception as e:
+                    logger.error(
+                        f"Publisher-{self.publisher_id}: Error processing queue: {e}",
+                        exc_info=True,
+                    )
+                    await asyncio.sleep(1)
+                    try:
+                        await self.queue.requeue_own(redis)
+                    except Exception:
+                        pass  # Requeued on reconnect or by other publishers
+
+            await self.queue.leave(redis)
+        finally:
+            maintenance.cancel()
+            await asyncio.gather(maintenance, return_exceptions=True)
 
     async def run(self):
         """Main loop with auto-reconnect"""
@@ -0,0 +1,186 @@
+"""
+MQTT Topic Router
+Maps MQTT topic filters to handlers using a trie of topic levels
+"""
+
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+RouteHandler = Callable[..., Awaitable[Any]]
+
+SINGLE_LEVEL = "+"
+MULTI_LEVEL = "#"
+
+
+class _Node:
+    """Single topic level of the routing trie"""
+
+    __slots__ = ("children", "handler")
+
+    def __init__(self):
+        self.children: dict[str, "_Node"] = {}
+        self.handler: Optional[RouteHandler] = None
+
+
+class TopicRouter:
+    """
+    Routes MQTT topics to handlers registered for topic filters
+
+    Filters are split into levels and stored in a trie, so matching costs
+    O(topic depth) regardless of the number of routes. Exact levels win over
+    "+" and "+" wins over "#", so "#" can be used as a fallback.
+
+    Values matched by "+" (and the remainder matched by "#") are passed to the
+    handler as positional arguments after topic and data:
+
+        @router.route("from_device/+/status")
+        async def device_status(topic: str, data: Any, username: str):
+            ...
+    """
+
+    def __init__(self):
+        self._root = _Node()
+        self._subscriptions: list[str] = []
+
+    @staticmethod
+    def validate_filter(topic_filter: str) -> list[str]:
+        """
+        Split topic filter into levels, validating wildcard placement
+
+        Args:
+            topic_filter: MQTT topic filter
+
+        Returns:
+            Filter levels
+
+        Raises:
+            ValueError: If wildcards are misplaced
+        """
+        levels = topic_filter.split("/")
+        for i, level in enumerate(levels):
+            if MULTI_LEVEL in level and (level != MULTI_LEVEL or i != len(levels) - 1):
+                raise ValueError(f"'#' must be the last whole level: {topic_filter}")
+            if SINGLE_LEVEL in level and level != SINGLE_LEVEL:
+                raise ValueError(f"'+' must be a whole level: {topic_filter}")
+        return levels
+
+    def add_route(
+        self, topic_filter: str, handler: RouteHandler, subscribe: bool = True
+    ):
+        """
+        Register handler for topic filter
+
+        Args:
+            topic_filter: MQTT topic filter ("from_device/+/status", "#")
+            handler: Async callable (topic, data, *wildcard_values)
+            subscribe: Whether MQTT handler should subscribe to this filter
+                (set False for fallbacks covered by other subscriptions)
+        """
+        node = self._root
+        for level in self.validate_filter(topic_filter):
+            node = node.children.setdefault(level, _Node())
+
+        if node.handler is not None:
+            raise ValueError(f"Route already registered: {topic_filter}")
+        node.handler = handler
+
+        if subscribe:
+            self._subscriptions.append(topic_filter)
+
+    def route(self, topic_filter: str, subscribe: bool = True):
+        """
+        Decorator to register handler for topic filter
+
+        Usage:
+            @router.route("from_device/+/event")
+            async def device_event(topic, data, username):
+                ...
+        """
+
+        def decorator(handler: RouteHandler) -> RouteHandler:
+            self.add_route(topic_filter, handler, subscribe=subscribe)
+            return handler
+
+        return decorator
+
+    def topic_filters(self) -> list[str]:
+        """
+        Get topic filters to subscribe to
+
+        Returns:
+            Registered filters in registration order
+        """
+        return list(self._subscriptions)
+
+    def match(self, topic: str) -> Optional[tuple[RouteHandler, list[str]]]:
+        """
+        Find handler for topic
+
+        Args:
+            topic: MQTT topic
+
+        Returns:
+            (handler, wildcard values) or None if no route matches
+        """
+        return self._match(self._root, topic.split("/"), 0, [])
+
+    def _match(
+        self, node: _Node, levels: list[str], depth: int, params: list[str]
+    ) -> Optional[tuple[RouteHandler, list[str]]]:
+        if depth == len(levels):
+            if node.handler is not None:
+                return node.handler, params
+            # "a/#" also matches the parent level "a"
+            child = node.children.get(MULTI_LEVEL)
+            if child is not None and child.handler is not None:
+                return child.handler, params + [""]
+            return None
+
+        level = levels[depth]
+
+        child = node.children.get(level)
+        if child is not None:
+            found = self._match(child, levels, depth + 1, params)
+            if found:
+                return found
+
+        # Per MQTT spec wildcards at the first level don't match "$SYS/..." topics
+        if depth == 0 and level.startswith("$"):
+            return None
+
+        child = node.children.get(SINGLE_LEVEL)
+        if child is not None:
+            found = self._match(child, levels, depth + 1, params + [level])
+            if found:
+                return found
+
+        child = node.children.get(MULTI_LEVEL)
+        if child is not None:
+            return child.handler, params + ["/".join(levels[depth:])]
+
+        return None
+
+    async def dispatch(self, topic: str, data: Any) -> bool:
+        """
+        Call handler registered for topic
+
+        Args:
+            topic: MQTT topic
+            data: Decoded message payload
+
+        Returns:
+            bool: True if a route matched
+        """
+        found = self.match(topic)
+        if found is None:
+            return False
+
+        handler, params = found
+        await handler(topic, data, *params)
+        return True
+
+
+# Singleton instance
+router = TopicRouter()
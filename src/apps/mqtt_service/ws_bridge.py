@@ -0,0 +1,109 @@
+"""
+MQTT -> WebSocket bridge
+Forwards device messages to per-device WebSocket groups, coalescing bursts
+into one update per device per window
+"""
+
+import asyncio
+import logging
+from typing import Any, Optional
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from apps.devices.presence import resolve_device_ids
+from websocket.utils.fanout import group_send_each
+from websocket.utils.keys import device_group_name
+
+logger = logging.getLogger(__name__)
+
+
+class WebSocketBridge:
+    """
+    Buffers device messages and sends one "device.update" per device and
+    window to its group
+
+    Status is latest-value-wins within the window, events are kept in order.
+    Devices nobody is subscribed to are dropped after one pipelined group
+    lookup per window, without writing anything to the channel layer.
+    """
+
+    def __init__(self, flush_interval: Optional[float] = None):
+        """
+        Initialize bridge
+
+        Args:
+            flush_interval: Coalescing window in seconds
+        """
+        self.flush_interval = flush_interval or settings.DEVICE_WS_BRIDGE_INTERVAL
+        self.channel_layer = get_channel_layer()
+        self._status: dict[str, Any] = {}
+        self._events: dict[str, list] = {}
+        self._flush_lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start periodic flush task"""
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self):
+        """Stop periodic flush task and send remaining updates"""
+        if self._timer is not None:
+            self._timer.cancel()
+            await asyncio.gather(self._timer, return_exceptions=True)
+            self._timer = None
+        await self.flush()
+
+    def add(self, kind: str, username: str, data: Any):
+        """
+        Buffer device message until the next flush
+
+        Args:
+            kind: Message kind ("status" or "event")
+            username: Device username from topic
+            data: Decoded payload
+        """
+        if kind == "status":
+            self._status[username] = data
+        else:
+            self._events.setdefault(username, []).append(data)
+
+    async def flush(self):
+        """Send buffered updates to groups that have subscribers"""
+        async with self._flush_lock:
+            if not self._status and not self._events:
+                return
+
+            status, self._status = self._status, {}
+            events, self._events = self._events, {}
+
+            try:
+                device_ids = await resolve_device_ids(status.keys() | events.keys())
+                messages = {}
+                for username, device_id in device_ids.items():
+                    update = {"type": "device.update", "device": device_id}
+                    if username in status:
+                        update["status"] = status[username]
+                    if username in events:
+                        update["events"] = events[username]
+                    messages[device_group_name(device_id)] = {
+                        "type": "event.stream.broadcast",
+                        "payload": update,
+                    }
+                await group_send_each(self.channel_layer, messages)
+            except Exception as e:
+                logger.error(
+                    f"Failed to bridge updates of "
+                    f"{len(status.keys() | events.keys())} devices: {e}",
+                    exc_info=True,
+                )
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+
+# Singleton instance
+ws_bridge = WebSocketBridge()
@@ -0,0 +1,84 @@
+"""
+Channel layer benchmark
+Compares stock RedisChannelLayer with HybridChannelLayer when sender and
+receiving sockets live in the same process (single worker case)
+
+Usage: python -m benchmarks.channel_layer [--sockets N] [--messages M]
+Uses the hosts of CHANNEL_LAYERS["default"], flushes the "bench" prefix
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
+
+from channels_redis.core import RedisChannelLayer  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+from websocket.layers import HybridChannelLayer  # noqa: E402
+
+
+async def measure(layer_class, sockets: int, messages: int) -> tuple[float, list]:
+    layer = layer_class(
+        hosts=settings.CHANNEL_LAYERS["default"]["CONFIG"]["hosts"], prefix="bench"
+    )
+    channels = [await layer.new_channel() for _ in range(sockets)]
+    for index, channel in enumerate(channels):
+        await layer.group_add(f"bench_{index}", channel)
+
+    latencies = []
+    done = asyncio.Event()
+
+    async def socket(channel: str):
+        # Same receive loop as a consumer
+        while True:
+            message = await layer.receive(channel)
+            latencies.append(time.perf_counter() - message["sent"])
+            if len(latencies) == messages:
+                done.set()
+
+    receivers = [asyncio.create_task(socket(channel)) for channel in channels]
+    await asyncio.sleep(0.1)
+
+    started = time.perf_counter()
+    for i in range(messages):
+        await layer.group_send(
+            f"bench_{i % sockets}",
+            {"type": "event.stream.broadcast", "sent": time.perf_counter()},
+        )
+    await asyncio.wait_for(done.wait(), timeout=60)
+    seconds = time.perf_counter() - started
+
+    for receiver in receivers:
+        receiver.cancel()
+    await asyncio.gather(*receivers, return_exceptions=True)
+    await layer.flush()
+    return seconds, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sockets", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=10_000)
+    args = parser.parse_args()
+
+    for layer_class in (RedisChannelLayer, HybridChannelLayer):
+        seconds, latencies = asyncio.run(
+            measure(layer_class, args.sockets, args.messages)
+        )
+        latencies.sort()
+        print(
+            f"{layer_class.__name__:>18}: {args.messages / seconds:,.0f} msg/s, "
+            f"latency p50 {statistics.median(latencies) * 1000:.2f}ms "
+            f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
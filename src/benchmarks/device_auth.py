@@ -0,0 +1,100 @@
+"""
+Device auth load benchmark
+Simulates a reconnect storm against the EMQX HTTP auth view: N devices
+CONNECT concurrently, first with cold caches, then again with warm caches
+
+Usage: python -m benchmarks.device_auth [--devices N] [--concurrency C]
+Creates N "bench_*" devices and deletes them afterwards
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
+
+from django.core.cache import cache  # noqa: E402
+from django.test import AsyncRequestFactory  # noqa: E402
+
+from apps.devices.auth_cache import credentials_key, local_cache  # noqa: E402
+from apps.devices.models import Device  # noqa: E402
+from apps.main.async_redis import close_async_redis  # noqa: E402
+from apps.main.views import check_mqtt_user  # noqa: E402
+
+PASSWORD = "bench-password"
+
+
+def create_devices(count: int) -> list[str]:
+    template = Device(username="bench_template")
+    template.set_password(PASSWORD)
+    devices = [
+        Device(
+            username=f"bench_{i:06d}",
+            name=f"bench_{i:06d}",
+            password_hash=template.password_hash,
+            salt=template.salt,
+        )
+        for i in range(count)
+    ]
+    Device.objects.bulk_create(devices, batch_size=1000)
+    return [device.username for device in devices]
+
+
+def reset_caches(usernames: list[str]):
+    local_cache.clear()
+    redis = cache.client.get_client()
+    for i in range(0, len(usernames), 1000):
+        redis.delete(*(credentials_key(u) for u in usernames[i : i + 1000]))
+
+
+async def storm(usernames: list[str], concurrency: int) -> tuple[float, int]:
+    factory = AsyncRequestFactory()
+    limit = asyncio.Semaphore(concurrency)
+    accepted = 0
+
+    async def connect(username: str):
+        nonlocal accepted
+        async with limit:
+            request = factory.post(
+                "/check-mqtt-user/", {"username": username, "password": PASSWORD}
+            )
+            response = await check_mqtt_user(request)
+            accepted += response.status_code == 200
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(connect(u) for u in usernames))
+    finally:
+        # Every run has its own loop, and with it its own pool
+        await close_async_redis()
+    return time.perf_counter() - started, accepted
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--devices", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, default=1_000)
+    args = parser.parse_args()
+
+    usernames = create_devices(args.devices)
+    try:
+        reset_caches(usernames)
+        for name in ("cold", "warm (LRU)", "warm (Redis)"):
+            if name == "warm (Redis)":
+                local_cache.clear()
+            seconds, accepted = asyncio.run(storm(usernames, args.concurrency))
+            print(
+                f"{name:>13}: {args.devices / seconds:,.0f} CONNECT/s "
+                f"({seconds:.2f}s, {accepted} accepted)"
+            )
+    finally:
+        reset_caches(usernames)
+        Device.objects.filter(username__in=usernames).delete()
+
+
+if __name__ == "__main__":
+    main()
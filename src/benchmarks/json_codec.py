@@ -0,0 +1,64 @@
+"""
+JSON codec micro-benchmark
+Compares per-message CPU of the old stdlib double-encoded queue envelope
+with the shared json_codec path (enqueue + publisher decode + handler decode)
+
+Usage: python -m benchmarks.json_codec [--messages N]
+"""
+
+import argparse
+import json
+import timeit
+
+from apps.main import json_codec
+
+PAYLOAD = {
+    "cmd": "set_config",
+    "params": {"interval": 30, "threshold": 21.5, "mode": "auto", "tags": ["a", "b"]},
+    "ts": 1760000000,
+}
+
+
+def stdlib_roundtrip():
+    # MQTTPublisherInterface.encode_message (before)
+    item = json.dumps(
+        {
+            "topic": "to_device/dev_1",
+            "payload": json.dumps(PAYLOAD),
+            "qos": 1,
+            "retain": False,
+        }
+    )
+    # MQTTPublisherClient.publish_message (before)
+    payload = str(json.loads(item)["payload"])
+    # MessageHandler.handle_message (before)
+    json.loads(payload.encode().decode())
+
+
+def codec_roundtrip():
+    # MQTTPublisherInterface.encode_message
+    item = json_codec.dumps(
+        {"topic": "to_device/dev_1", "payload": PAYLOAD, "qos": 1, "retain": False}
+    )
+    # MQTTPublisherClient.publish_message
+    payload = json_codec.dumps(json_codec.loads(item)["payload"])
+    # MessageHandler.handle_message
+    json_codec.loads(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"json_codec backend: {json_codec.BACKEND}, messages: {args.messages}")
+    results = {}
+    for name, func in (("stdlib", stdlib_roundtrip), ("json_codec", codec_roundtrip)):
+        seconds = min(timeit.repeat(func, number=args.messages, repeat=3))
+        results[name] = seconds
+        print(f"{name:>12}: {seconds / args.messages * 1e6:.2f} us/message")
+    print(f"{'speedup':>12}: {results['stdlib'] / results['json_codec']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Queue envelope size benchmark
+Compares Redis memory used by mqtt:publish_queue items in the legacy JSON
+envelope and the compact binary envelope
+
+Usage: python -m benchmarks.queue_envelope [--messages N]
+"""
+
+import argparse
+import json
+import os
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
+
+from django.core.cache import cache  # noqa: E402
+
+from apps.mqtt_service.envelope import encode_envelope  # noqa: E402
+
+PAYLOAD = {"cmd": "set_config", "params": {"interval": 30, "mode": "auto"}}
+
+
+def legacy_item(index: int) -> bytes:
+    return json.dumps(
+        {
+            "topic": f"to_device/device_{index:06d}",
+            "payload": json.dumps(PAYLOAD),
+            "qos": 1,
+            "retain": False,
+        }
+    ).encode()
+
+
+def compact_item(index: int) -> bytes:
+    return encode_envelope(f"to_device/device_{index:06d}", PAYLOAD, 1, False)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=100_000)
+    args = parser.parse_args()
+
+    redis = cache.client.get_client()
+    results = {}
+    for name, build in (("legacy", legacy_item), ("compact", compact_item)):
+        key = f"benchmark:queue_envelope:{name}"
+        items = [build(i) for i in range(args.messages)]
+        redis.delete(key)
+        pipe = redis.pipeline(transaction=False)
+        for i in range(0, len(items), 1000):
+            pipe.rpush(key, *items[i : i + 1000])
+        pipe.execute()
+
+        memory = redis.memory_usage(key, samples=0)
+        redis.delete(key)
+        results[name] = memory
+        print(
+            f"{name:>8}: {sum(map(len, items)) / len(items):.1f} bytes/item, "
+            f"Redis {memory / 1024 / 1024:.2f} MiB per {args.messages} items"
+        )
+
+    saved = results["legacy"] - results["compact"]
+    print(
+        f"   saved: {saved / 1024 / 1024:.2f} MiB "
+        f"({saved / results['legacy'] * 100:.0f}%) per {args.messages} items"
+    )
+
+
+if __name__ == "__main__":
+    main()
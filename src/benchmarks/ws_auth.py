@@ -0,0 +1,100 @@
+"""
+WebSocket auth benchmark
+Connects/sec through the session based AuthMiddlewareStack versus signed
+token auth, with a minimal app that only reads scope["user"]
+
+Usage: python -m benchmarks.ws_auth [--connects N] [--concurrency C]
+Creates a "bench_ws" user and session and deletes them afterwards
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
+
+from channels.auth import AuthMiddlewareStack  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import (  # noqa: E402
+    BACKEND_SESSION_KEY,
+    HASH_SESSION_KEY,
+    SESSION_KEY,
+    get_user_model,
+)
+from django.contrib.sessions.backends.db import SessionStore  # noqa: E402
+
+from websocket.auth import TokenAuthMiddleware, create_token  # noqa: E402
+
+
+async def app(scope, receive, send):
+    assert scope["user"].is_authenticated
+    scope["user"].pk
+
+
+async def connects(stack, scope: dict, count: int, concurrency: int) -> float:
+    limit = asyncio.Semaphore(concurrency)
+
+    async def connect():
+        async with limit:
+            await stack(dict(scope), None, None)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(connect() for _ in range(count)))
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connects", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    user = get_user_model().objects.create_user("bench_ws", password="bench")
+    session = SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.create()
+
+    base = {"type": "websocket", "path": "/ws/connect/", "headers": []}
+    runs = (
+        (
+            "session",
+            AuthMiddlewareStack(app),
+            {
+                **base,
+                "query_string": b"",
+                "headers": [
+                    (
+                        b"cookie",
+                        f"{settings.SESSION_COOKIE_NAME}={session.session_key}".encode(),
+                    )
+                ],
+            },
+        ),
+        (
+            "token",
+            TokenAuthMiddleware(app),
+            {**base, "query_string": f"token={create_token(user.pk)}".encode()},
+        ),
+    )
+    try:
+        for name, stack, scope in runs:
+            seconds = asyncio.run(
+                connects(stack, scope, args.connects, args.concurrency)
+            )
+            print(
+                f"{name:>8}: {args.connects / seconds:,.0f} connects/s "
+                f"({seconds:.2f}s)"
+            )
+    finally:
+        session.delete()
+        user.delete()
+
+
+if __name__ == "__main__":
+    main()
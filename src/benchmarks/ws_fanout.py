@@ -0,0 +1,118 @@
+"""
+WebSocket fan-out benchmark
+Compares notifying N users with one group_send per user against the batched
+WebsocketSender.async_send_to_users, through the configured channel layer
+
+Usage: python -m benchmarks.ws_fanout [--recipients 1000 10000 100000]
+Adds one fake channel per "bench_*" group and deletes the keys afterwards
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
+
+from websocket.utils.fanout import group_send_many  # noqa: E402
+from websocket.utils.senders import websocket_sender  # noqa: E402
+
+PAYLOAD = {"type": "device.event", "data": {"ok": True}}
+CHUNK_SIZE = 10_000
+
+
+def group_name(index: int) -> str:
+    return f"bench_{index}"
+
+
+def channel_name(index: int) -> str:
+    return f"bench.channel_{index}"
+
+
+async def run_chunked(layer, method: str, commands: list):
+    """Run (hash value, key, *args) commands pipelined per Redis host"""
+    for i in range(0, len(commands), CHUNK_SIZE):
+        pipes = {}
+        for value, key, *args in commands[i : i + CHUNK_SIZE]:
+            index = layer.consistent_hash(value)
+            if index not in pipes:
+                pipes[index] = layer.connection(index).pipeline(transaction=False)
+            getattr(pipes[index], method)(key, *args)
+        for pipe in pipes.values():
+            await pipe.execute()
+
+
+def group_keys(layer, count: int) -> list:
+    return [
+        (group_name(i), layer._group_key(group_name(i))) for i in range(count)
+    ]
+
+
+def channel_keys(layer, count: int) -> list:
+    return [
+        (channel_name(i), layer.prefix + channel_name(i)) for i in range(count)
+    ]
+
+
+async def setup(layer, count: int):
+    now = time.time()
+    await run_chunked(
+        layer,
+        "zadd",
+        [
+            (group, key, {channel_name(i): now})
+            for i, (group, key) in enumerate(group_keys(layer, count))
+        ],
+    )
+
+
+async def per_user(layer, count: int):
+    for i in range(count):
+        await layer.group_send(
+            group_name(i), {"type": "event.stream.broadcast", "payload": PAYLOAD}
+        )
+
+
+async def batched(layer, count: int):
+    # Same path as async_send_to_users, with bench group names
+    await group_send_many(
+        layer,
+        [group_name(i) for i in range(count)],
+        {"type": "event.stream.broadcast", "payload": PAYLOAD},
+    )
+
+
+async def measure(count: int):
+    layer = websocket_sender.channel_layer
+    await setup(layer, count)
+    try:
+        for name, send in (("per-user", per_user), ("batched", batched)):
+            started = time.perf_counter()
+            await send(layer, count)
+            seconds = time.perf_counter() - started
+            print(
+                f"{count:>7} recipients {name:>9}: {seconds:8.3f}s "
+                f"({count / seconds:,.0f} users/s)"
+            )
+            # Drop delivered messages so both runs start with empty channels
+            await run_chunked(layer, "delete", channel_keys(layer, count))
+    finally:
+        await run_chunked(layer, "delete", group_keys(layer, count))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--recipients", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    args = parser.parse_args()
+
+    for count in args.recipients:
+        asyncio.run(measure(count))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+WebSocket frame benchmark
+Bytes on the wire and server encode CPU for N device updates in each frame
+protocol, one event per frame and batched
+
+Usage: python -m benchmarks.ws_frames [--events N] [--batch B]
+"deflate" column approximates permessage-deflate (no context takeover)
+"""
+
+import argparse
+import os
+import random
+import time
+import zlib
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
+
+from websocket.protocols import PROTOCOLS  # noqa: E402
+
+
+def make_events(count: int) -> list[dict]:
+    rng = random.Random(0)
+    return [
+        {
+            "type": "device.update",
+            "device": rng.randint(1, 10_000),
+            "status": {
+                "temperature": round(rng.uniform(-20, 40), 2),
+                "humidity": rng.randint(0, 100),
+                "battery": round(rng.uniform(3.0, 4.2), 3),
+                "online": True,
+            },
+        }
+        for _ in range(count)
+    ]
+
+
+def frame_header_size(length: int) -> int:
+    # Server -> client frames are not masked
+    if length < 126:
+        return 2
+    return 4 if length < 65536 else 10
+
+
+def deflated_size(frame) -> int:
+    if isinstance(frame, str):
+        frame = frame.encode()
+    compressor = zlib.compressobj(wbits=-15)
+    # permessage-deflate strips the trailing empty block (4 bytes)
+    return len(compressor.compress(frame) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+
+
+def measure(protocol, events: list[dict], batch: int) -> tuple[int, int, float]:
+    if batch > 1:
+        messages = [
+            {"type": "batch", "events": events[i : i + batch]}
+            for i in range(0, len(events), batch)
+        ]
+    else:
+        messages = events
+
+    started = time.process_time()
+    frames = [protocol.dumps(message) for message in messages]
+    cpu = time.process_time() - started
+
+    sizes = [
+        len(frame.encode()) if isinstance(frame, str) else len(frame)
+        for frame in frames
+    ]
+    raw = sum(size + frame_header_size(size) for size in sizes)
+    deflated = sum(
+        size + frame_header_size(size) for size in map(deflated_size, frames)
+    )
+    return raw, deflated, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=10_000)
+    parser.add_argument("--batch", type=int, default=20)
+    args = parser.parse_args()
+
+    events = make_events(args.events)
+    print(f"{'mode':>16} {'bytes':>10} {'deflate':>10} {'encode CPU':>11}")
+    for protocol in PROTOCOLS.values():
+        for batch in (1, args.batch):
+            raw, deflated, cpu = measure(protocol, events, batch)
+            mode = protocol.name if batch == 1 else f"{protocol.name} x{batch}"
+            print(f"{mode:>16} {raw:>10,} {deflated:>10,} {cpu * 1000:>9.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
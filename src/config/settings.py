@@ -82,6 +82,9 @@ CACHES = {
     },
 }
 
+# Max connections per event loop for the native asyncio Redis client
+REDIS_ASYNC_MAX_CONNECTIONS = env.int("REDIS_ASYNC_MAX_CONNECTIONS", default=50)
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -103,7 +106,8 @@ ASGI_APPLICATION = "config.asgi.application"
 
 CHANNEL_LAYERS = {
     "default": {
-        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        # Redis layer with in-process delivery to sockets of the same worker
+        "BACKEND": "websocket.layers.HybridChannelLayer",
         "CONFIG": {
             "hosts": [
                 (
@@ -115,6 +119,20 @@ CHANNEL_LAYERS = {
     },
 }
 
+# WebSocket connection entries are refreshed by their consumer every TTL/3
+# and expire if the worker dies
+USER_PRESENCE_TTL = env.int("USER_PRESENCE_TTL", default=90)
+
+# Max ?batch_ms= a WebSocket client may request, in seconds
+WS_BATCH_MAX_INTERVAL = env.float("WS_BATCH_MAX_INTERVAL", default=1.0)
+
+# Signed WebSocket tokens (ws/connect/?token=), user objects cached per worker
+WS_TOKEN_MAX_AGE = env.int("WS_TOKEN_MAX_AGE", default=60 * 60)
+WS_TOKEN_USER_CACHE_SIZE = env.int("WS_TOKEN_USER_CACHE_SIZE", default=10_000)
+WS_TOKEN_USER_CACHE_TTL = env.float("WS_TOKEN_USER_CACHE_TTL", default=60)
+# Active flag of token users shared by all workers (dropped on user save/delete)
+WS_TOKEN_USER_REDIS_TTL = env.int("WS_TOKEN_USER_REDIS_TTL", default=10 * 60)
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
@@ -184,6 +202,78 @@ MQTT_BROKER_PORT = env.int("MQTT_BROKER_PORT")
 MQTT_USERNAME = env.str("MQTT_ROOT_USERNAME")
 MQTT_PASSWORD = env.str("MQTT_ROOT_PASSWORD")
 
+# Device commands: seconds a command waits for the device reply, and seconds
+# the final result is kept afterwards
+MQTT_COMMAND_TIMEOUT = env.float("MQTT_COMMAND_TIMEOUT", default=30)
+MQTT_COMMAND_RESULT_TTL = env.int("MQTT_COMMAND_RESULT_TTL", default=300)
+
+# Publish queue: failed publishes are retried with exponential backoff, then
+# moved to the dead-letter list (mqtt:publish_queue:dead, newest N kept)
+MQTT_PUBLISH_MAX_ATTEMPTS = env.int("MQTT_PUBLISH_MAX_ATTEMPTS", default=5)
+MQTT_PUBLISH_RETRY_BASE_DELAY = env.float("MQTT_PUBLISH_RETRY_BASE_DELAY", default=1)
+MQTT_PUBLISH_RETRY_MAX_DELAY = env.float("MQTT_PUBLISH_RETRY_MAX_DELAY", default=60)
+MQTT_PUBLISH_DEAD_LETTER_SIZE = env.int("MQTT_PUBLISH_DEAD_LETTER_SIZE", default=10_000)
+# In-flight messages of a publisher silent for this long are requeued
+MQTT_PUBLISHER_HEARTBEAT_TTL = env.int("MQTT_PUBLISHER_HEARTBEAT_TTL", default=30)
+# Share of fetches each priority lane is drained first in, and max messages
+# of one topic taken per fetch (messages of a topic are published in order)
+MQTT_PUBLISH_LANE_WEIGHTS = env.dict(
+    "MQTT_PUBLISH_LANE_WEIGHTS",
+    subcast_values=int,
+    default={"high": 8, "normal": 3, "low": 1},
+)
+MQTT_PUBLISH_TOPIC_BATCH = env.int("MQTT_PUBLISH_TOPIC_BATCH", default=10)
+# Downlink token buckets shared by all publishers (messages/s and burst size,
+# rate 0 disables the limit); over budget topics are deferred, not dropped.
+# Topic prefix limits: "to_device/fw_=5,to_device/=500" (burst = 1s of rate)
+MQTT_PUBLISH_GLOBAL_RATE = env.float("MQTT_PUBLISH_GLOBAL_RATE", default=0)
+MQTT_PUBLISH_GLOBAL_BURST = env.int("MQTT_PUBLISH_GLOBAL_BURST", default=1000)
+MQTT_PUBLISH_DEVICE_RATE = env.float("MQTT_PUBLISH_DEVICE_RATE", default=0)
+MQTT_PUBLISH_DEVICE_BURST = env.int("MQTT_PUBLISH_DEVICE_BURST", default=10)
+MQTT_PUBLISH_PREFIX_RATES = env.dict(
+    "MQTT_PUBLISH_PREFIX_RATES", subcast_values=float, default={}
+)
+
+# Device credential cache (EMQX HTTP auth)
+DEVICE_AUTH_LOCAL_CACHE_SIZE = env.int("DEVICE_AUTH_LOCAL_CACHE_SIZE", default=100_000)
+DEVICE_AUTH_LOCAL_CACHE_TTL = env.float("DEVICE_AUTH_LOCAL_CACHE_TTL", default=30)
+DEVICE_AUTH_REDIS_TTL = env.int("DEVICE_AUTH_REDIS_TTL", default=24 * 60 * 60)
+DEVICE_AUTH_MISSING_TTL = env.int("DEVICE_AUTH_MISSING_TTL", default=60)
+
+# Device ACL cache (EMQX HTTP authorization)
+DEVICE_ACL_LOCAL_CACHE_SIZE = env.int("DEVICE_ACL_LOCAL_CACHE_SIZE", default=100_000)
+DEVICE_ACL_LOCAL_CACHE_TTL = env.float("DEVICE_ACL_LOCAL_CACHE_TTL", default=30)
+DEVICE_ACL_REDIS_TTL = env.int("DEVICE_ACL_REDIS_TTL", default=24 * 60 * 60)
+
+# Device telemetry ingestion (MQTT handler -> Postgres)
+DEVICE_INGEST_BATCH_SIZE = env.int("DEVICE_INGEST_BATCH_SIZE", default=500)
+DEVICE_INGEST_FLUSH_INTERVAL = env.float("DEVICE_INGEST_FLUSH_INTERVAL", default=1.0)
+# Username -> Device.pk cache of MQTT handler processes, unknown usernames are
+# kept for a short time only, so new devices are picked up quickly
+DEVICE_ID_CACHE_SIZE = env.int("DEVICE_ID_CACHE_SIZE", default=100_000)
+DEVICE_ID_CACHE_TTL = env.float("DEVICE_ID_CACHE_TTL", default=300)
+DEVICE_ID_MISSING_TTL = env.float("DEVICE_ID_MISSING_TTL", default=10)
+
+# MQTT -> WebSocket bridge (per-device groups), status is coalesced per window
+DEVICE_WS_BRIDGE_INTERVAL = env.float("DEVICE_WS_BRIDGE_INTERVAL", default=0.1)
+DEVICE_WS_MAX_SUBSCRIPTIONS = env.int("DEVICE_WS_MAX_SUBSCRIPTIONS", default=100)
+# Updates/s per subscription when client doesn't set max_rate (0 = every message)
+DEVICE_WS_DEFAULT_MAX_RATE = env.float("DEVICE_WS_DEFAULT_MAX_RATE", default=0)
+
+# Device telemetry partitions (daily) and rollups
+DEVICE_TELEMETRY_RETENTION_DAYS = env.int("DEVICE_TELEMETRY_RETENTION_DAYS", default=30)
+DEVICE_TELEMETRY_PARTITIONS_AHEAD = env.int(
+    "DEVICE_TELEMETRY_PARTITIONS_AHEAD", default=3
+)
+DEVICE_MINUTE_ROLLUP_RETENTION_DAYS = env.int(
+    "DEVICE_MINUTE_ROLLUP_RETENTION_DAYS", default=14
+)
+DEVICE_HOUR_ROLLUP_RETENTION_DAYS = env.int(
+    "DEVICE_HOUR_ROLLUP_RETENTION_DAYS", default=365
+)
+DEVICE_ROLLUP_LAG_SECONDS = env.int("DEVICE_ROLLUP_LAG_SECONDS", default=30)
+DEVICE_ROLLUP_MAX_WINDOW_HOURS = env.int("DEVICE_ROLLUP_MAX_WINDOW_HOURS", default=6)
+
 
 # Celery Settings
 CELERY_BROKER_URL = (
@@ -201,6 +291,17 @@ CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes
 CELERY_RESULT_EXPIRES = 3600  # 1 hour
+# Synced into django_celery_beat periodic tasks on beat start
+CELERY_BEAT_SCHEDULE = {
+    "maintain-telemetry-partitions": {
+        "task": "apps.devices.tasks.maintain_telemetry_partitions",
+        "schedule": 6 * 60 * 60,  # 6 hours
+    },
+    "update-telemetry-rollups": {
+        "task": "apps.devices.tasks.update_telemetry_rollups",
+        "schedule": 60,
+    },
+}
 
 # Logging
 LOG_LEVEL = env.str("LOG_LEVEL", default="INFO")
@@ -0,0 +1,184 @@
+"""
+WebSocket token auth
+Signed tokens (Django signing, HMAC with SECRET_KEY) validated in memory on
+connect, so reconnect storms don't load sessions and users from Postgres.
+
+The user behind a token is checked to be active as well (plain signature
+checks would keep accepting deactivated users until the token expires). The
+flag is shared by all workers in Redis and dropped when the user is saved or
+deleted, so a reconnect storm costs at most one query per user fleet-wide.
+Workers that already hold the user object notice the change within
+WS_TOKEN_USER_CACHE_TTL.
+"""
+
+import logging
+from typing import Optional
+from urllib.parse import parse_qs
+
+from channels.auth import AuthMiddlewareStack
+from channels.middleware import BaseMiddleware
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core import signing
+from django.core.cache import cache
+
+from apps.main.async_redis import get_async_redis
+from apps.main.local_cache import LocalTTLCache
+
+logger = logging.getLogger(__name__)
+
+TOKEN_SALT = "websocket.token"
+
+# Values of the shared active flag
+ACTIVE = b"1"
+INACTIVE = b"0"
+
+# Stored for deleted/inactive users, so they are cached too
+MISSING = object()
+
+# Full user objects by pk (their permission caches are reused as well)
+user_cache = LocalTTLCache(
+    max_size=settings.WS_TOKEN_USER_CACHE_SIZE,
+    ttl=settings.WS_TOKEN_USER_CACHE_TTL,
+)
+
+
+def active_user_key(user_id: int) -> str:
+    return f"websocket:active_user:{user_id}"
+
+
+def create_token(user_id: int) -> str:
+    return signing.dumps(user_id, salt=TOKEN_SALT)
+
+
+def read_token(token: str) -> Optional[int]:
+    """
+    Validate token signature and age
+
+    Args:
+        token: Token from query string
+
+    Returns:
+        User id or None if token is invalid or expired
+    """
+    try:
+        user_id = signing.loads(
+            token, salt=TOKEN_SALT, max_age=settings.WS_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return None
+    return user_id if isinstance(user_id, int) else None
+
+
+async def get_cached_user(user_id: int):
+    """
+    Get active user from cache or DB
+
+    Args:
+        user_id: User id
+
+    Returns:
+        User or None if there is no such active user
+    """
+    user = user_cache.get(user_id)
+    if user is None:
+        user = (
+            await get_user_model()
+            .objects.filter(pk=user_id, is_active=True)
+            .afirst()
+        )
+        user_cache.set(user_id, MISSING if user is None else user)
+    return None if user is MISSING else user
+
+
+async def is_active_user(user_id: int) -> bool:
+    """
+    Check that user exists and is active (worker cache, Redis, then DB)
+
+    Args:
+        user_id: User id
+
+    Returns:
+        bool: True if user is active
+    """
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user is not MISSING
+
+    redis = get_async_redis()
+    key = active_user_key(user_id)
+    value = await redis.get(key)
+    if value is not None:
+        return value == ACTIVE
+
+    user = await get_cached_user(user_id)
+    await redis.set(
+        key,
+        INACTIVE if user is None else ACTIVE,
+        ex=settings.WS_TOKEN_USER_REDIS_TTL,
+    )
+    return user is not None
+
+
+def invalidate_user(user_id: int):
+    """
+    Drop cached active flag and user object (sync, called from model signals)
+
+    Args:
+        user_id: User id
+    """
+    user_cache.delete(user_id)
+    try:
+        cache.client.get_client().delete(active_user_key(user_id))
+    except Exception as e:
+        logger.error(f"Failed to invalidate token user {user_id}: {e}")
+
+
+class TokenUser:
+    """
+    User authenticated by WebSocket token
+
+    Set only for active users, the full user object is served from the
+    worker cache when a consumer needs more than identity.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, user_id: int):
+        self.pk = self.id = user_id
+
+    async def aget_user(self):
+        return await get_cached_user(self.pk)
+
+    async def ahas_perm(self, perm: str, obj=None) -> bool:
+        user = await self.aget_user()
+        return user is not None and await user.ahas_perm(perm, obj)
+
+    def __str__(self):
+        return f"TokenUser({self.pk})"
+
+
+class TokenAuthMiddleware(BaseMiddleware):
+    """
+    Authenticates ?token= connections in memory, other connections go
+    through the session based AuthMiddlewareStack
+    """
+
+    def __init__(self, inner):
+        super().__init__(inner)
+        self.session_inner = AuthMiddlewareStack(inner)
+
+    async def __call__(self, scope, receive, send):
+        query = parse_qs(scope.get("query_string", b"").decode(errors="replace"))
+        token = query.get("token", [None])[0]
+        if token is None:
+            return await self.session_inner(scope, receive, send)
+
+        user_id = read_token(token)
+        if user_id is not None and not await is_active_user(user_id):
+            user_id = None
+        scope = dict(scope)
+        scope["user"] = AnonymousUser() if user_id is None else TokenUser(user_id)
+        return await super().__call__(scope, receive, send)
@@ -1,15 +1,40 @@
+import asyncio
+import logging
+import math
+import time
+
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
+
+from apps.devices.models import Device
+from websocket.protocols import negotiate
+from websocket.utils.keys import device_group_name, user_group_name
+from websocket.utils.user_status_cache import (
+    async_remove_connection,
+    async_touch_connection,
+)
 
-from websocket.utils.keys import user_group_name
-from websocket.utils.user_status_cache import set_user_status
+logger = logging.getLogger(__name__)
 
 
 class ManagementConsumer(AsyncJsonWebsocketConsumer):
     """
     WebSocket consumer for managing devices
     ws://localhost:8000/ws/connect/
+
+    Frames are JSON text by default, "msgpack" / "cbor" subprotocols (or
+    ?format=) switch to binary frames, ?batch_ms=N sends events collected
+    during N ms as one {"type": "batch", "events": [...]} frame
     """
 
+    # Events kept per device while its update waits for the next send slot
+    MAX_BUFFERED_EVENTS = 100
+    # Events per batch frame, a full batch is sent without waiting
+    MAX_BATCH_SIZE = 100
+    # Bounds of positive max_rate (updates/s), other values are clamped
+    MIN_MAX_RATE = 0.01
+    MAX_MAX_RATE = 100
+
     async def connect(self):
         self.user = self.scope["user"]
 
@@ -18,31 +43,241 @@ class ManagementConsumer(AsyncJsonWebsocketConsumer):
             return
 
         self.group_name = user_group_name(self.user.pk)
+        # Device id -> min seconds between updates (0 sends every message)
+        self.devices: dict[int, float] = {}
+        self.can_view_devices = None
+        # Conflation state of rate limited subscriptions
+        self.pending: dict[int, dict] = {}
+        self.next_send: dict[int, float] = {}
+        self.flush_tasks: dict[int, asyncio.Task] = {}
+        self.protocol, subprotocol, self.batch_interval = negotiate(self.scope)
+        self.batch: list[dict] = []
+        self.batch_task = None
         await self.channel_layer.group_add(self.group_name, self.channel_name)
-        await self.accept()
-        set_user_status(self.user.pk, True)
+        await self.accept(subprotocol)
+        await async_touch_connection(self.user.pk, self.channel_name)
+        self.presence_task = asyncio.create_task(self.refresh_presence())
 
     async def disconnect(self, close_code):
+        if not self.user.is_authenticated:
+            return
+        self.presence_task.cancel()
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
-        set_user_status(self.user.pk, False)
+        for task in self.flush_tasks.values():
+            task.cancel()
+        if self.batch_task is not None:
+            self.batch_task.cancel()
+        for device_id in self.devices:
+            await self.channel_layer.group_discard(
+                device_group_name(device_id), self.channel_name
+            )
+        await async_remove_connection(self.user.pk, self.channel_name)
+
+    async def refresh_presence(self):
+        """
+        Keep connection entry alive while the socket is open, a worker that
+        dies without disconnect leaves it to expire after USER_PRESENCE_TTL
+        """
+        interval = settings.USER_PRESENCE_TTL / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await async_touch_connection(self.user.pk, self.channel_name)
+            except Exception as e:
+                # Retried on next interval, the entry outlives two misses
+                logger.warning(f"Failed to refresh presence of {self.channel_name}: {e}")
+
+    async def receive(self, text_data=None, bytes_data=None, **kwargs):
+        data = text_data if text_data is not None else bytes_data
+        if data is None:
+            return
+        try:
+            content = self.protocol.loads(data)
+        except self.protocol.errors:
+            content = None
+        if not isinstance(content, dict):
+            await self.send_json({"type": "error", "message": "Invalid message"})
+            return
+        await self.receive_json(content)
+
+    async def send_json(self, content, close=False):
+        frame = self.protocol.dumps(content)
+        if self.protocol.binary:
+            await self.send(bytes_data=frame, close=close)
+        else:
+            await self.send(text_data=frame, close=close)
+
+    async def send_event(self, payload: dict):
+        """
+        Send event frame, or add it to the current batch in batching mode
+
+        Args:
+            payload: Event payload
+        """
+        if not self.batch_interval:
+            await self.send_json(payload)
+            return
+        self.batch.append(payload)
+        if len(self.batch) >= self.MAX_BATCH_SIZE:
+            await self.flush_batch()
+        elif self.batch_task is None:
+            self.batch_task = asyncio.create_task(self.flush_batch_later())
+
+    async def flush_batch_later(self):
+        await asyncio.sleep(self.batch_interval)
+        self.batch_task = None
+        await self.flush_batch()
+
+    async def flush_batch(self):
+        if self.batch:
+            events, self.batch = self.batch, []
+            await self.send_json({"type": "batch", "events": events})
 
     async def receive_json(self, content: dict):
         action = content.get("action")
         if action == "ping":
+            await async_touch_connection(self.user.pk, self.channel_name)
             await self.send_json({"type": "pong"})
         elif action == "echo":
             message = content.get("message", "")
             await self.send_json({"type": "echo", "message": message})
         elif action == "subscribe":
-            topic = content.get("topic")
-            if topic:
-                await self.channel_layer.group_add(topic, self.channel_name)
-                await self.send_json({"type": "subscribed", "topic": topic})
+            await self.subscribe_device(
+                content.get("device"), content.get("max_rate")
+            )
         elif action == "unsubscribe":
-            topic = content.get("topic")
-            if topic:
-                await self.channel_layer.group_discard(topic, self.channel_name)
-                await self.send_json({"type": "unsubscribed", "topic": topic})
+            await self.unsubscribe_device(content.get("device"))
+
+    async def subscribe_device(self, device_id, max_rate=None):
+        """
+        Join device group to receive its "device.update" messages
+
+        Args:
+            device_id: Device id from client message
+            max_rate: Max updates per second, updates in between are
+                conflated (latest status, accumulated events). Every
+                message is sent if not set or 0, positive values are clamped
+                to [MIN_MAX_RATE, MAX_MAX_RATE]
+        """
+        if max_rate is None:
+            max_rate = settings.DEVICE_WS_DEFAULT_MAX_RATE
+        error = None
+        if not isinstance(device_id, int) or isinstance(device_id, bool):
+            error = "Invalid device"
+        elif (
+            not isinstance(max_rate, (int, float))
+            or isinstance(max_rate, bool)
+            or not math.isfinite(max_rate)
+            or max_rate < 0
+        ):
+            error = "Invalid max_rate"
+        elif (
+            device_id not in self.devices
+            and len(self.devices) >= settings.DEVICE_WS_MAX_SUBSCRIPTIONS
+        ):
+            error = "Too many subscriptions"
+        elif not await self.has_device_access(device_id):
+            error = "Device not found"
+        if error:
+            await self.send_json(
+                {"type": "error", "action": "subscribe", "message": error}
+            )
+            return
+
+        if device_id not in self.devices:
+            await self.channel_layer.group_add(
+                device_group_name(device_id), self.channel_name
+            )
+        if max_rate:
+            max_rate = min(max(max_rate, self.MIN_MAX_RATE), self.MAX_MAX_RATE)
+        self.devices[device_id] = 1 / max_rate if max_rate else 0
+        await self.send_json(
+            {"type": "subscribed", "device": device_id, "max_rate": max_rate}
+        )
+
+    async def unsubscribe_device(self, device_id):
+        if device_id in self.devices:
+            await self.channel_layer.group_discard(
+                device_group_name(device_id), self.channel_name
+            )
+            del self.devices[device_id]
+            self.pending.pop(device_id, None)
+            self.next_send.pop(device_id, None)
+            task = self.flush_tasks.pop(device_id, None)
+            if task is not None:
+                task.cancel()
+        await self.send_json({"type": "unsubscribed", "device": device_id})
+
+    async def has_device_access(self, device_id: int) -> bool:
+        """
+        Check if user may watch device (devices.view_device permission)
+
+        Args:
+            device_id: Device id
+
+        Returns:
+            bool: True if user has permission and device exists
+        """
+        if self.can_view_devices is None:
+            self.can_view_devices = await self.user.ahas_perm("devices.view_device")
+        return (
+            self.can_view_devices
+            and await Device.objects.filter(pk=device_id).aexists()
+        )
 
     async def event_stream_broadcast(self, event: dict):
-        await self.send_json(event.get("payload", {}))
+        payload = event.get("payload", {})
+        interval = None
+        if payload.get("type") == "device.update":
+            interval = self.devices.get(payload.get("device"))
+        if interval:
+            await self.send_conflated(payload["device"], payload, interval)
+        else:
+            await self.send_event(payload)
+
+    async def send_conflated(self, device_id: int, update: dict, interval: float):
+        """
+        Send device update at most once per interval
+
+        Updates arriving before the next send slot are merged into a single
+        pending update, sent by a timer when the slot opens.
+
+        Args:
+            device_id: Device id
+            update: "device.update" payload
+            interval: Min seconds between sends
+        """
+        pending = self.pending.get(device_id)
+        if pending is not None:
+            if "status" in update:
+                pending["status"] = update["status"]
+            if "events" in update:
+                events = pending.setdefault("events", [])
+                events.extend(update["events"])
+                del events[: -self.MAX_BUFFERED_EVENTS]
+            return
+
+        delay = self.next_send.get(device_id, 0) - time.monotonic()
+        if delay <= 0:
+            self.next_send[device_id] = time.monotonic() + interval
+            await self.send_event(update)
+            return
+
+        self.pending[device_id] = {
+            **update,
+            "events": list(update.get("events", ()))[-self.MAX_BUFFERED_EVENTS :],
+        }
+        self.flush_tasks[device_id] = asyncio.create_task(
+            self.flush_device(device_id, delay, interval)
+        )
+
+    async def flush_device(self, device_id: int, delay: float, interval: float):
+        await asyncio.sleep(delay)
+        self.flush_tasks.pop(device_id, None)
+        update = self.pending.pop(device_id, None)
+        if update is None:
+            return
+        if not update["events"]:
+            del update["events"]
+        self.next_send[device_id] = time.monotonic() + interval
+        await self.send_event(update)
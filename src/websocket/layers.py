@@ -0,0 +1,205 @@
+"""
+Hybrid channel layer
+Redis channel layer that hands messages for sockets of the same process
+straight to their receive buffers, only the remaining recipients go through
+Redis
+"""
+
+import asyncio
+import logging
+import threading
+from collections import Counter, defaultdict
+from typing import Optional
+
+import msgpack
+from channels.exceptions import ChannelFull
+from channels_redis.core import RedisChannelLayer
+
+from apps.main.async_redis import close_async_redis
+
+logger = logging.getLogger(__name__)
+
+
+class HybridChannelLayer(RedisChannelLayer):
+    """
+    RedisChannelLayer with an in-process fast path
+
+    Group membership is still stored in Redis, so other workers reach our
+    sockets as before. Channels of this process that joined a group through
+    this layer are also kept in a local registry, and messages for them skip
+    the Redis write, BZPOPMIN and backup queue round trips.
+
+    Receiving of process-local channels is split into a pump task that
+    BZPOPMINs the process key (one pending pop per process, as before) and
+    an in-memory inbox, so local messages don't wait behind a blocking Redis
+    pop and the pop is never cancelled to serve them. The inbox belongs to
+    the loop receivers run in (receive_event_loop of channels_redis is reset
+    between messages, so it can't be used for that). The pump only pops
+    while someone receives and waits while the inbox is full, local
+    messages that don't fit go through Redis (under such overload they may
+    arrive out of order).
+    """
+
+    # Max messages waiting in the inbox
+    INBOX_SIZE = 10_000
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Loop of receivers, set on first receive
+        self._inbox_loop: Optional[asyncio.AbstractEventLoop] = None
+        # (channel or channels, message) items for receivers of this process
+        self._inbox: Optional[asyncio.Queue] = None
+        self._pump: Optional[asyncio.Task] = None
+        # Guards the local registry, deliver_local runs in sender threads too
+        self._local_lock = threading.Lock()
+        # Group name -> channels of this process in the group
+        self.local_groups: defaultdict[str, set[str]] = defaultdict(set)
+        # Local channel -> number of groups it is in (known to be alive)
+        self.local_channels: Counter = Counter()
+
+    def is_local(self, channel: str) -> bool:
+        return "!" in channel and self.non_local_name(channel).endswith(
+            f".{self.client_prefix}!"
+        )
+
+    def deliver_local(self, channels, message: dict) -> list[str]:
+        """
+        Put message into receive buffers of live channels of this process
+
+        Safe to call from any event loop (e.g. async_to_sync senders), the
+        inbox is filled in the loop that receives.
+
+        Args:
+            channels: Channel names
+            message: Channel layer message
+
+        Returns:
+            Channels that have to be reached through Redis
+        """
+        loop = self._inbox_loop
+        if loop is None or loop.is_closed() or self._inbox.full():
+            return list(channels)
+
+        local = []
+        remote = []
+        with self._local_lock:
+            for channel in channels:
+                (local if channel in self.local_channels else remote).append(channel)
+        if local:
+            # Every receiver gets its own copy, same as with Redis delivery
+            packed = msgpack.packb(message)
+            if loop is asyncio.get_running_loop():
+                self._put_local(loop, local, packed)
+            else:
+                loop.call_soon_threadsafe(self._put_local, loop, local, packed)
+        return remote
+
+    def _put_local(self, loop, channels: list[str], packed: bytes):
+        # Same as a Redis message for several channels of this process,
+        # receive() fans it out to their buffers
+        message = msgpack.unpackb(packed)
+        if loop is self._inbox_loop and not self._inbox.full():
+            self._inbox.put_nowait((channels, message))
+        else:
+            asyncio.ensure_future(self._send_redis(channels, message))
+
+    async def _send_redis(self, channels: list[str], message: dict):
+        """Send message that didn't fit into the inbox through Redis"""
+        for channel in channels:
+            try:
+                await super().send(channel, dict(message))
+            except ChannelFull:
+                logger.info(f"Channel {channel} over capacity")
+            except Exception as e:
+                logger.error(f"Failed to send message to {channel}: {e}")
+
+    async def receive_single(self, channel):
+        if not channel.endswith(f".{self.client_prefix}!"):
+            return await super().receive_single(channel)
+
+        loop = asyncio.get_running_loop()
+        if loop is not self._inbox_loop:
+            # First receive, or receiving moved to another loop
+            self._inbox = asyncio.Queue(maxsize=self.INBOX_SIZE)
+            self._inbox_loop = loop
+            self._pump = None
+
+        inbox = self._inbox
+        get = asyncio.ensure_future(inbox.get())
+        try:
+            while True:
+                if self._pump is None or self._pump.done():
+                    self._pump = asyncio.ensure_future(self._pump_redis(channel))
+                pump = self._pump
+                await asyncio.wait({get, pump}, return_when=asyncio.FIRST_COMPLETED)
+                if get.done():
+                    return get.result()
+                # Redis error of the pump is raised to receivers, next call
+                # restarts it; a pump that stopped for lack of receivers is
+                # started again
+                pump.result()
+        except asyncio.CancelledError:
+            if get.done() and not get.cancelled():
+                # Taken for a receiver that is gone, keep it for the others
+                channels, message = get.result()
+                if not inbox.full():
+                    inbox.put_nowait((channels, message))
+                else:
+                    if isinstance(channels, str):
+                        channels = [channels]
+                    asyncio.ensure_future(self._send_redis(channels, message))
+            raise
+        finally:
+            get.cancel()
+
+    async def _pump_redis(self, channel: str):
+        """Move messages of the process key from Redis to the inbox"""
+        inbox = self._inbox
+        while self.receive_count:
+            # Waits while the inbox is full, so Redis keeps the backlog
+            await inbox.put(await super().receive_single(channel))
+
+    async def send(self, channel, message):
+        with self._local_lock:
+            local = channel in self.local_channels
+        if local and self._inbox_loop is not None:
+            assert "__asgi_channel__" not in message
+            buffer = self.receive_buffer.get(channel)
+            if buffer is not None and buffer.qsize() >= self.get_capacity(channel):
+                raise ChannelFull()
+            if not self.deliver_local([channel], message):
+                return
+        await super().send(channel, message)
+
+    async def group_add(self, group, channel):
+        await super().group_add(group, channel)
+        if not self.is_local(channel):
+            return
+        with self._local_lock:
+            if channel not in self.local_groups[group]:
+                self.local_groups[group].add(channel)
+                self.local_channels[channel] += 1
+
+    async def group_discard(self, group, channel):
+        await super().group_discard(group, channel)
+        with self._local_lock:
+            members = self.local_groups.get(group)
+            if members and channel in members:
+                members.discard(channel)
+                if not members:
+                    del self.local_groups[group]
+                self.local_channels[channel] -= 1
+                if self.local_channels[channel] <= 0:
+                    del self.local_channels[channel]
+
+    async def group_send(self, group, message):
+        # websocket.utils creates the sender (and this layer) on import
+        from websocket.utils.fanout import group_send_many
+
+        await group_send_many(self, [group], message)
+
+    async def close_pools(self):
+        await super().close_pools()
+        # Consumers of this loop share the get_async_redis() pool (flush
+        # ends here too)
+        await close_async_redis()
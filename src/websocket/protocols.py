@@ -0,0 +1,91 @@
+"""
+WebSocket frame protocols
+Per-connection encoding of ManagementConsumer frames: JSON text (default),
+MessagePack or CBOR binary, optionally with several events per frame
+"""
+
+from typing import Any, Callable, NamedTuple, Optional
+from urllib.parse import parse_qs
+
+import msgpack
+from django.conf import settings
+
+from apps.main import json_codec
+
+try:
+    import cbor2
+except ImportError:  # pragma: no cover - optional dependency
+    cbor2 = None
+
+
+class FrameProtocol(NamedTuple):
+    name: str
+    binary: bool
+    dumps: Callable[[Any], Any]
+    loads: Callable[[Any], Any]
+    # Raised by loads on invalid frames
+    errors: tuple
+
+
+PROTOCOLS = {
+    "json": FrameProtocol(
+        "json",
+        False,
+        json_codec.dumps_str,
+        json_codec.loads,
+        json_codec.JSONDecodeError,
+    ),
+    "msgpack": FrameProtocol(
+        "msgpack",
+        True,
+        msgpack.packb,
+        msgpack.unpackb,
+        (ValueError, TypeError, msgpack.UnpackException),
+    ),
+}
+
+if cbor2 is not None:
+    PROTOCOLS["cbor"] = FrameProtocol(
+        "cbor", True, cbor2.dumps, cbor2.loads, (TypeError, cbor2.CBORDecodeError)
+    )
+
+
+class Negotiated(NamedTuple):
+    protocol: FrameProtocol
+    # Subprotocol to echo in the handshake, None if chosen by query string
+    subprotocol: Optional[str]
+    # Seconds events are collected into one frame, 0 sends each event alone
+    batch_interval: float
+
+
+def negotiate(scope: dict) -> Negotiated:
+    """
+    Pick frame protocol of connection
+
+    The first supported Sec-WebSocket-Protocol ("json", "msgpack", "cbor")
+    wins, otherwise ?format=. Batching is requested with ?batch_ms=N and is
+    capped by WS_BATCH_MAX_INTERVAL.
+
+    Args:
+        scope: ASGI websocket scope
+
+    Returns:
+        Negotiated protocol, subprotocol and batch interval
+    """
+    query = parse_qs(scope.get("query_string", b"").decode(errors="replace"))
+
+    protocol, subprotocol = PROTOCOLS["json"], None
+    for name in scope.get("subprotocols", ()):
+        if name in PROTOCOLS:
+            protocol, subprotocol = PROTOCOLS[name], name
+            break
+    else:
+        name = query.get("format", ["json"])[0]
+        protocol = PROTOCOLS.get(name, protocol)
+
+    try:
+        batch_ms = max(float(query.get("batch_ms", ["0"])[0]), 0)
+    except ValueError:
+        batch_ms = 0
+    batch_interval = min(batch_ms / 1000, settings.WS_BATCH_MAX_INTERVAL)
+    return Negotiated(protocol, subprotocol, batch_interval)
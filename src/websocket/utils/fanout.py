@@ -0,0 +1,172 @@
+"""
+Bulk group fan-out
+Sends messages to many channel layer groups in a few pipelined round
+trips instead of one group_send (3+ round trips) per group
+"""
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+
+from channels_redis.core import RedisChannelLayer
+
+from apps.main.lua_script import LuaScript
+
+logger = logging.getLogger(__name__)
+
+# Channel keys per Lua call, keeps each script short enough not to stall Redis
+SEND_CHUNK_SIZE = 1000
+
+# Same as channels_redis group_send script, applied to any number of channels
+SEND_SCRIPT = """
+local over_capacity = 0
+local current_time = ARGV[#ARGV - 1]
+local expiry = ARGV[#ARGV]
+for i = 1, #KEYS do
+    redis.call('ZREMRANGEBYSCORE', KEYS[i], 0, current_time - expiry)
+    if redis.call('ZCOUNT', KEYS[i], '-inf', '+inf') < tonumber(ARGV[i + #KEYS]) then
+        redis.call('ZADD', KEYS[i], current_time, ARGV[i])
+        redis.call('EXPIRE', KEYS[i], expiry)
+    else
+        over_capacity = over_capacity + 1
+    end
+end
+return over_capacity
+"""
+send_script = LuaScript(SEND_SCRIPT)
+
+
+async def group_members(layer: RedisChannelLayer, groups: list[str]) -> dict:
+    """
+    Collect channel names of groups, one pipeline per Redis host
+
+    Args:
+        layer: Redis channel layer
+        groups: Group names
+
+    Returns:
+        Group name -> channel names
+    """
+    by_connection = defaultdict(list)
+    for group in groups:
+        assert layer.require_valid_group_name(group), "Group name not valid"
+        by_connection[layer.consistent_hash(group)].append(group)
+
+    expired = int(time.time()) - layer.group_expiry
+    members = {}
+    for index, names in by_connection.items():
+        pipe = layer.connection(index).pipeline(transaction=False)
+        for group in names:
+            key = layer._group_key(group)
+            pipe.zremrangebyscore(key, min=0, max=expired)
+            pipe.zrange(key, 0, -1)
+        # Every second result is a ZRANGE reply
+        for group, channels in zip(names, (await pipe.execute())[1::2]):
+            members[group] = [channel.decode() for channel in channels]
+    return members
+
+
+async def send_to_channels(layer: RedisChannelLayer, deliveries: list):
+    """
+    Deliver messages to channels, one Lua call per Redis host and chunk
+
+    Channels of this process are served in memory by layers that support it
+    (HybridChannelLayer), the rest go to Redis.
+
+    Args:
+        layer: Redis channel layer
+        deliveries: (channel names, message) pairs
+    """
+    deliver_local = getattr(layer, "deliver_local", None)
+    if deliver_local is not None:
+        deliveries = [
+            (deliver_local(channels, message), message)
+            for channels, message in deliveries
+        ]
+
+    keys = defaultdict(list)
+    args = defaultdict(list)
+    capacities = defaultdict(list)
+    for channels, message in deliveries:
+        (
+            connection_to_keys,
+            key_to_message,
+            key_to_capacity,
+        ) = layer._map_channel_keys_to_connection(channels, message)
+        for index, channel_keys in connection_to_keys.items():
+            keys[index] += channel_keys
+            args[index] += [key_to_message[key] for key in channel_keys]
+            capacities[index] += [key_to_capacity[key] for key in channel_keys]
+
+    over_capacity = 0
+    for index, channel_keys in keys.items():
+        connection = layer.connection(index)
+        for i in range(0, len(channel_keys), SEND_CHUNK_SIZE):
+            chunk = slice(i, i + SEND_CHUNK_SIZE)
+            over_capacity += await send_script(
+                connection,
+                keys=channel_keys[chunk],
+                args=[
+                    *args[index][chunk],
+                    *capacities[index][chunk],
+                    time.time(),
+                    layer.expiry,
+                ],
+            )
+    if over_capacity:
+        logger.info(f"{over_capacity} channels over capacity")
+
+
+async def group_send_many(layer, groups: list[str], message):
+    """
+    Send the same message to many groups
+
+    Every channel receives the message once, even if it is in several of the
+    groups. Layers other than RedisChannelLayer fall back to concurrent
+    group_send calls.
+
+    Args:
+        layer: Channel layer
+        groups: Group names
+        message: Channel layer message
+    """
+    if not groups:
+        return
+    if not isinstance(layer, RedisChannelLayer):
+        await asyncio.gather(*(layer.group_send(group, message) for group in groups))
+        return
+
+    members = await group_members(layer, groups)
+    channels = set().union(*members.values())
+    if channels:
+        await send_to_channels(layer, [(channels, message)])
+
+
+async def group_send_each(layer, messages: dict):
+    """
+    Send a different message to each group
+
+    Groups without members are skipped after a single pipelined lookup, so
+    nothing is written for them.
+
+    Args:
+        layer: Channel layer
+        messages: Group name -> channel layer message
+    """
+    if not messages:
+        return
+    if not isinstance(layer, RedisChannelLayer):
+        await asyncio.gather(
+            *(layer.group_send(group, message) for group, message in messages.items())
+        )
+        return
+
+    members = await group_members(layer, list(messages))
+    deliveries = [
+        (members[group], message)
+        for group, message in messages.items()
+        if members[group]
+    ]
+    if deliveries:
+        await send_to_channels(layer, deliveries)
@@ -2,5 +2,9 @@ def user_group_name(user_id: int) -> str:
     return f"user_{user_id}"
 
 
-def user_online_status_key(user_id: int) -> str:
-    return f"user_{user_id}_online"
+def user_presence_key(user_id: int) -> str:
+    return f"user_{user_id}_presence"
+
+
+def device_group_name(device_id: int) -> str:
+    return f"device_{device_id}"
@@ -5,6 +5,7 @@ Helpers to push messages to WebSocket users/groups from any part of Django (view
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 
+from websocket.utils.fanout import group_send_many
 from websocket.utils.keys import user_group_name
 
 
@@ -22,8 +23,7 @@ class WebsocketSender:
         )
 
     def send_to_users(self, ids: list[int], payload: dict) -> None:
-        for user_id in ids:
-            self.send_to_user(user_id, payload)
+        async_to_sync(self.async_send_to_users)(ids, payload)
 
     def send_to_group(self, group_name: str, payload: dict) -> None:
         async_to_sync(self.channel_layer.group_send)(
@@ -39,8 +39,11 @@ class WebsocketSender:
         )
 
     async def async_send_to_users(self, ids: list[int], payload: dict) -> None:
-        for user_id in ids:
-            await self.async_send_to_user(user_id, payload)
+        await group_send_many(
+            self.channel_layer,
+            [user_group_name(user_id) for user_id in ids],
+            {"type": "event.stream.broadcast", "payload": payload},
+        )
 
     async def async_send_to_group(self, group_name: str, payload: dict) -> None:
         await self.channel_layer.group_send(
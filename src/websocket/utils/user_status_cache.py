@@ -1,18 +1,138 @@
+"""
+User online status
+One Redis hash per user with a field per open WebSocket connection
+(channel name -> expiry timestamp), refreshed by the consumer's ping
+
+A user is online while at least one connection entry hasn't expired, so
+closing one of several tabs keeps the user online, and entries of a crashed
+worker stop counting after USER_PRESENCE_TTL
+"""
+
+import logging
+import time
+from typing import Iterable
+
+from django.conf import settings
 from django.core.cache import cache
 
-from websocket.utils.keys import user_online_status_key
+from apps.main.async_redis import get_async_redis
+from apps.main.lua_script import LuaScript
+from websocket.utils.keys import user_presence_key
+
+logger = logging.getLogger(__name__)
+
+# Adds/refreshes connection entry, drops expired entries of the user and
+# extends key TTL, so a user whose workers all died expires as a whole
+TOUCH_SCRIPT = """
+local entries = redis.call('HGETALL', KEYS[1])
+for i = 1, #entries, 2 do
+    if tonumber(entries[i + 1]) < tonumber(ARGV[3]) then
+        redis.call('HDEL', KEYS[1], entries[i])
+    end
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return 1
+"""
+touch_script = LuaScript(TOUCH_SCRIPT)
+
+
+def has_live_entry(expiries: Iterable, now: float) -> bool:
+    """
+    Check if any connection entry is not expired
 
+    Args:
+        expiries: Hash values (expiry timestamps)
+        now: Current timestamp
 
-def set_user_status(user_id: int, is_online: bool):
+    Returns:
+        bool: True if user has a live connection
+    """
+    return any(float(expiry) >= now for expiry in expiries)
+
+
+# -------- async API (consumers) --------
+async def async_touch_connection(user_id: int, channel_name: str):
+    """
+    Register connection or refresh its heartbeat
+
+    Args:
+        user_id: User id
+        channel_name: Channel name of the connection
+    """
     if user_id is None:
         return
-    if is_online:
-        cache.set(user_online_status_key(user_id), True)
-    else:
-        cache.delete(user_online_status_key(user_id))
+    ttl = settings.USER_PRESENCE_TTL
+    now = time.time()
+    try:
+        await touch_script(
+            get_async_redis(),
+            keys=[user_presence_key(user_id)],
+            args=[channel_name, now + ttl, now, ttl],
+        )
+    except Exception as e:
+        logger.error(f"Failed to refresh presence of user {user_id}: {e}")
 
 
+async def async_remove_connection(user_id: int, channel_name: str):
+    """
+    Remove connection entry, user goes offline with the last one
+
+    Args:
+        user_id: User id
+        channel_name: Channel name of the connection
+    """
+    if user_id is None:
+        return
+    try:
+        await get_async_redis().hdel(user_presence_key(user_id), channel_name)
+    except Exception as e:
+        logger.error(f"Failed to remove presence of user {user_id}: {e}")
+
+
+async def async_is_user_online(user_id: int) -> bool:
+    if user_id is None:
+        return False
+    expiries = await get_async_redis().hvals(user_presence_key(user_id))
+    return has_live_entry(expiries, time.time())
+
+
+async def async_are_users_online(ids: Iterable[int]) -> dict[int, bool]:
+    ids = list(ids)
+    pipe = get_async_redis().pipeline(transaction=False)
+    for user_id in ids:
+        pipe.hvals(user_presence_key(user_id))
+    now = time.time()
+    return {
+        user_id: has_live_entry(expiries, now)
+        for user_id, expiries in zip(ids, await pipe.execute())
+    }
+
+
+# -------- sync API --------
 def is_user_online(user_id: int) -> bool:
     if user_id is None:
         return False
-    return bool(cache.get(user_online_status_key(user_id), False))
+    expiries = cache.client.get_client().hvals(user_presence_key(user_id))
+    return has_live_entry(expiries, time.time())
+
+
+def are_users_online(ids: Iterable[int]) -> dict[int, bool]:
+    """
+    Check online status of many users with one pipelined round trip
+
+    Args:
+        ids: User ids
+
+    Returns:
+        User id -> online mapping
+    """
+    ids = list(ids)
+    pipe = cache.client.get_client().pipeline(transaction=False)
+    for user_id in ids:
+        pipe.hvals(user_presence_key(user_id))
+    now = time.time()
+    return {
+        user_id: has_live_entry(expiries, now)
+        for user_id, expiries in zip(ids, pipe.execute())
+    }